@@ -0,0 +1,94 @@
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncCamera:
+    """asyncio facade over an EvaluationKit (or OnyxMax).
+    Blocking SDK calls run on a single worker thread, so they are serialized as with the synchronous API while the
+    event loop keeps serving other tasks. Frames are produced by the native FrameGrabber thread:
+        camera = AsyncCamera(OnyxMax())
+        await camera.write_sensor_reg(0x0C, 100)
+        async with camera.stream() as frames:
+            async for frame in frames:
+                process(frame.image)"""
+
+    def __init__(self, ek):
+        self.ek = ek
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AsyncCamera")
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def read(self, address, size, decode=True):
+        return await self._call(self.ek.read, address, size, decode)
+
+    async def write(self, address, data):
+        return await self._call(self.ek.write, address, data)
+
+    async def read_sensor_reg(self, address):
+        return await self._call(self.ek.read_sensor_reg, address)
+
+    async def write_sensor_reg(self, address, value):
+        return await self._call(self.ek.write_sensor_reg, address, value)
+
+    async def get_property(self, name):
+        """Read a property of the camera, e.g. await camera.get_property("exposure_time")"""
+        return await self._call(getattr, self.ek, name)
+
+    async def set_property(self, name, value):
+        """Write a property of the camera, e.g. await camera.set_property("exposure_time", 10)"""
+        return await self._call(setattr, self.ek, name, value)
+
+    async def start_acquisition(self):
+        return await self._call(self.ek.start_acquisition)
+
+    async def stop_acquisition(self):
+        return await self._call(self.ek.stop_acquisition)
+
+    async def get_image(self, timeout=5000):
+        return await self._call(self.ek.get_image, timeout)
+
+    def stream(self, queue_size=16, policy="drop-oldest", timeout=1000):
+        """Stream frames from a background grabber, see EvaluationKit.start_grabber.
+        returns an async context manager yielding an async iterator of Frame"""
+        return FrameStream(self, queue_size, policy, timeout)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class FrameStream:
+    """Async iterator over the frames of a FrameGrabber, started and stopped by async with."""
+
+    def __init__(self, camera, queue_size, policy, timeout):
+        self.camera = camera
+        self.queue_size = queue_size
+        self.policy = policy
+        self.timeout = timeout
+        self.grabber = None
+
+    async def __aenter__(self):
+        self.grabber = await self.camera._call(self.camera.ek.start_grabber, self.queue_size, self.policy, self.timeout)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.camera._call(self.camera.ek.stop_grabber)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await asyncio.get_running_loop().run_in_executor(None, self._next_frame)
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    def _next_frame(self):
+        # Wait in short slices so that a stopped grabber ends the iteration
+        while True:
+            try:
+                return self.grabber.get(timeout=0.1)
+            except queue.Empty:
+                if not self.grabber.running:
+                    return None
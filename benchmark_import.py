@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Cold start cost of the acquisition core: each import runs in a fresh interpreter, as for a short-lived capture job.
+    python benchmark_import.py [repeats]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Imports measured, from the headless core to the core with the plotting helpers
+IMPORTS = {
+    "interpreter": "pass",
+    "core (sensor)": "import sensor",
+    "core + plotting": "import sensor, plotting",
+}
+REPEATS = 10
+
+
+def import_time(statement, repeats=REPEATS):
+    """Wall time in s of a fresh interpreter running statement, best and median of repeats.
+    returns (best, median)"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=directory, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+    print("Cold import time over {} runs:".format(repeats))
+    for name, statement in IMPORTS.items():
+        best, median = import_time(statement, repeats)
+        print("\t{:<20} best={:7.1f} ms  median={:7.1f} ms".format(name, best * 1e3, median * 1e3))
@@ -0,0 +1,189 @@
+import os
+
+import numpy as np
+
+from ptc import TemporalAccumulator
+
+
+class DarkCorrector:
+    """Dark correction applied in-place with saturating integer arithmetic (no float round trip):
+        image = clip(image - offset + pedestal, 0, max of the pixel type)
+    The offset frame is precomputed once, so that correcting a frame costs four in-place integer passes."""
+
+    def __init__(self, offset, pedestal=0):
+        """Constructor
+        :param offset: Offset frame, of the type of the frames to correct.
+        :param pedestal: Constant added back after the subtraction, keeps the noise below the dark level."""
+        dtype = offset.dtype
+        maxval = np.iinfo(dtype).max
+        offset = offset.astype(np.int64) - pedestal
+        self.dtype = dtype
+        self.pedestal = pedestal
+        self._sub = np.clip(offset, 0, maxval).astype(dtype)
+        add = np.clip(-offset, 0, maxval)
+        self._add = add.astype(dtype) if add.any() else None
+        self._limit = None if self._add is None else (maxval - add).astype(dtype)
+
+    def apply(self, image):
+        """Correct a frame (or a Frame) in-place.
+        returns the corrected image"""
+        image = getattr(image, "image", image)
+        if image.dtype != self.dtype:
+            raise ValueError(f"DarkCorrector expects {self.dtype} frames, got {image.dtype}")
+        np.maximum(image, self._sub, out=image)
+        image -= self._sub
+        if self._add is not None:
+            np.minimum(image, self._limit, out=image)
+            image += self._add
+        return image
+
+    def attach(self, frames):
+        """Correct every frame of a stream in-place.
+        returns a generator of frames"""
+        for frame in frames:
+            self.apply(frame)
+            yield frame
+
+
+class DarkCalibration:
+    """Master dark frame and column/row fixed pattern noise maps of one acquisition condition (exposure time, pixel
+    format, temperature)."""
+
+    def __init__(self, dark, col_fpn, row_fpn, exposure_time, pixel_format, temperature):
+        """Constructor
+        :param dark: Master dark frame, temporal mean of dark frames rounded to the pixel type.
+        :param col_fpn: Deviation of each column mean from the dark level (float32).
+        :param row_fpn: Deviation of each row mean from the dark level (float32).
+        :param exposure_time: Exposure time in ms.
+        :param pixel_format: EK/XML pixel format name.
+        :param temperature: Sensor temperature in °C (see read_thermo)."""
+        self.dark = dark
+        self.col_fpn = col_fpn
+        self.row_fpn = row_fpn
+        self.exposure_time = exposure_time
+        self.pixel_format = pixel_format
+        self.temperature = temperature
+
+    @property
+    def level(self):
+        """Mean dark level"""
+        return float(self.dark.mean())
+
+    @staticmethod
+    def build(frames, exposure_time, pixel_format, temperature):
+        """Build the calibration from an iterable of dark frames (or Frame)."""
+        accumulator = None
+        dtype = None
+        for frame in frames:
+            image = getattr(frame, "image", frame)
+            if accumulator is None:
+                accumulator = TemporalAccumulator(image.shape)
+                dtype = image.dtype
+            accumulator.add(image)
+        if accumulator is None:
+            raise Exception("No dark frame to build the calibration from")
+        mean = accumulator.mean
+        level = mean.mean()
+        dark = np.clip(np.rint(mean), 0, np.iinfo(dtype).max).astype(dtype)
+        col_fpn = (mean.mean(axis=0) - level).astype(np.float32)
+        row_fpn = (mean.mean(axis=1) - level).astype(np.float32)
+        return DarkCalibration(dark, col_fpn, row_fpn, exposure_time, pixel_format, temperature)
+
+    @staticmethod
+    def capture(camera, nframes=32, timeout=5000):
+        """Acquire nframes dark frames with the current settings of an OnyxMax and build the calibration.
+        NOTE: The sensor must be in the dark."""
+        exposure_time = camera.exposure_time
+        pixel_format = camera.pixel_format
+        temperature = camera.read_thermo()
+        err = camera.start_acquisition()
+        if err != 0:
+            raise Exception(f"PiGentlSdkStartAcquisition: {err}")
+        try:
+            frames = (camera.get_image(timeout)[1] for _ in range(nframes))
+            return DarkCalibration.build(frames, exposure_time, pixel_format, temperature)
+        finally:
+            camera.stop_acquisition()
+
+    def corrector(self, mode="dark", pedestal=0):
+        """Precompute the correction.
+        :param mode: "dark" subtracts the master dark frame, "fpn" only the mean level and the column/row patterns.
+        :param pedestal: Constant added back after the subtraction.
+        returns DarkCorrector"""
+        if mode == "dark":
+            offset = self.dark
+        elif mode == "fpn":
+            # (H, W), or (H, W, 3) for RGB whose patterns are (H, 3) and (W, 3)
+            offset = self.level + self.row_fpn[:, None] + self.col_fpn[None, :]
+            offset = np.clip(np.rint(offset), 0, np.iinfo(self.dark.dtype).max).astype(self.dark.dtype)
+        else:
+            raise ValueError(f"Unknown correction mode {mode!r}, expected 'dark' or 'fpn'")
+        return DarkCorrector(offset, pedestal=pedestal)
+
+    def save(self, path):
+        np.savez(
+            path,
+            dark=self.dark,
+            col_fpn=self.col_fpn,
+            row_fpn=self.row_fpn,
+            exposure_time=self.exposure_time,
+            pixel_format=self.pixel_format,
+            temperature=self.temperature,
+        )
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return DarkCalibration(
+                data["dark"],
+                data["col_fpn"],
+                data["row_fpn"],
+                float(data["exposure_time"]),
+                str(data["pixel_format"]),
+                float(data["temperature"]),
+            )
+
+
+class CalibrationCache:
+    """Dark calibrations cached on disk, keyed by exposure time, pixel format and temperature (by steps of
+    temperature_step °C):
+        cache = CalibrationCache("calibration")
+        calibration = cache.get_or_capture(camera)
+        corrector = calibration.corrector()"""
+
+    def __init__(self, directory="calibration", temperature_step=5.0):
+        self.directory = directory
+        self.temperature_step = temperature_step
+        self._calibrations = {}
+        if not (os.path.exists(directory)):
+            os.makedirs(directory)
+
+    def key(self, exposure_time, pixel_format, temperature):
+        return round(exposure_time, 3), pixel_format, int(round(temperature / self.temperature_step))
+
+    def path(self, key):
+        exposure_time, pixel_format, temperature_bin = key
+        temperature = temperature_bin * self.temperature_step
+        name = "dark_{}_exp{:g}ms_T{:g}.npz".format(pixel_format, exposure_time, temperature)
+        return os.path.join(self.directory, name)
+
+    def get(self, exposure_time, pixel_format, temperature):
+        """returns the cached DarkCalibration or None"""
+        key = self.key(exposure_time, pixel_format, temperature)
+        calibration = self._calibrations.get(key)
+        if calibration is None and os.path.isfile(self.path(key)):
+            calibration = self._calibrations[key] = DarkCalibration.load(self.path(key))
+        return calibration
+
+    def put(self, calibration):
+        key = self.key(calibration.exposure_time, calibration.pixel_format, calibration.temperature)
+        calibration.save(self.path(key))
+        self._calibrations[key] = calibration
+
+    def get_or_capture(self, camera, nframes=32):
+        """returns the calibration of the current settings of an OnyxMax, captured (in the dark) if not cached"""
+        calibration = self.get(camera.exposure_time, camera.pixel_format, camera.read_thermo())
+        if calibration is None:
+            calibration = DarkCalibration.capture(camera, nframes)
+            self.put(calibration)
+        return calibration
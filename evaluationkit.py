@@ -1,15 +1,36 @@
+import math
 import time
 import struct
 from utils import *
+from grabber import FrameGrabber
+from regcache import RegisterCache
+from packing import packed_nbits_unpack, packed_pixel_format_unpack, unpack_mono10p
+from telemetry import FrameTelemetry
+from instrumentation import InstrumentedLibrary
 
 CAM_ERR_SUCCESS = 0
 NBUFFER = 100
+# Limits of the number of buffers chosen by buffer_count
+MIN_BUFFERS = 4
+MAX_BUFFERS = 1000
+DEFAULT_BUFFER_MEMORY = 512 * 1024 * 1024  # bytes
+DEFAULT_BUFFER_LATENCY = 200  # ms of frames buffered
+# Fixed delay around PiGentlSdkFlushBuffers when fast re-arm is disabled
+REARM_DELAY = 0.1  # s
 
-# set up access to Python 3 PyMemoryView_FromMemory() function
-PyBUF_READ = 0x200
-buf_from_mem = ctypes.pythonapi.PyMemoryView_FromMemory
-buf_from_mem.restype = ctypes.py_object
-buf_from_mem.argtypes = (ctypes.c_void_p, ctypes.c_int, ctypes.c_int)
+
+def buffer_count(frame_bytes, memory_budget=DEFAULT_BUFFER_MEMORY, latency_ms=None, frame_rate=None):
+    """Number of SDK buffers for frames of frame_bytes bytes.
+    :param memory_budget: Maximum memory in bytes used by the buffers.
+    :param latency_ms: Time in ms the buffers must absorb when the host does not consume frames, needs frame_rate.
+    :param frame_rate: Expected frame rate in frames/s.
+    returns the number of buffers, between MIN_BUFFERS and MAX_BUFFERS"""
+    if frame_bytes <= 0:
+        raise ValueError(f"Cannot size the buffers of frames of {frame_bytes} bytes, is the pixel format known?")
+    count = min(memory_budget // frame_bytes, MAX_BUFFERS)
+    if latency_ms is not None and frame_rate:
+        count = min(count, math.ceil(latency_ms * 1e-3 * frame_rate) + 1)
+    return int(max(count, MIN_BUFFERS))
 
 
 # Define structs C
@@ -47,68 +68,202 @@ class tImageInfos(ctypes.Structure):
     ]
 
 
+# Buffer information of a frame acquired into an array (see get_image_into and grab_burst)
+frame_info_dtype = np.dtype(
+    [
+        ("block_id", "<u8"),
+        ("timestamp", "<u8"),
+        ("is_incomplete", "u1"),
+        ("is_new_data", "u1"),
+    ]
+)
+
+
+def _store_frame_info(info, image_infos):
+    info["block_id"] = image_infos.iBlockId
+    info["timestamp"] = image_infos.iTimestamp
+    info["is_incomplete"] = image_infos.isIncomplete
+    info["is_new_data"] = image_infos.isNewData
+
+
+class GetBufferTimeout(Exception):
+    """No buffer was delivered within the timeout of GetBuffer, as opposed to an immediate failure (acquisition not
+    started, camera disconnected)."""
+
+
+def _timed_out(start_ns, timeout):
+    """The SDK does not tell a timeout from another error: a failed GetBuffer which waited at least half of its
+    timeout (in ms) is taken as a timeout."""
+    return time.perf_counter_ns() - start_ns >= timeout * 500_000
+
+
+class Frame:
+    """An image delivered by the acquisition engine together with its buffer information.
+    A leased frame (see EvaluationKit.lease_image) holds a read-only view onto the SDK buffer which is requeued by
+    release(). Any other frame owns its pixels and release() does nothing."""
+
+    def __init__(self, image, image_infos, release=None):
+        self.image = image
+        self.block_id = image_infos.iBlockId
+        self.timestamp = image_infos.iTimestamp
+        self.is_incomplete = bool(image_infos.isIncomplete)
+        self.is_new_data = bool(image_infos.isNewData)
+        self.size = image_infos.iImageSize
+        # Host time of reception in ns (time.perf_counter_ns), comparable across cameras unlike timestamp
+        self.host_timestamp = time.perf_counter_ns()
+        # Settings in effect when the frame was acquired (see ParameterSweep)
+        self.settings = None
+        self.step = None
+        self._release = release
+
+    @property
+    def leased(self):
+        return self._release is not None
+
+    def release(self):
+        """Give the SDK buffer back to the acquisition engine. The image must not be used afterwards."""
+        if self._release is not None:
+            release, self._release = self._release, None
+            self.image = None
+            release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def load_library(dll_path, cti_path):
+    """Load and initialize the pigentl-sdk library.
+    :param dll_path: The absolute path to the pigentl DLL.
+    :param cti_path: The absolute path to the pigentl CTI.
+    returns the library, to be terminated with PiGentlSdkTerminateLibrary"""
+    if not os.path.isfile(dll_path):
+        raise FileNotFoundError(f"The pigentl-sdk DLL was not found at the following location: {dll_path}")
+    if not os.path.isfile(cti_path):
+        raise FileNotFoundError(f"The pigentl-sdk CTI was not found at the following location: {cti_path}")
+    try:
+        ctypes.cdll.LoadLibrary(cti_path)
+        libc = ctypes.cdll.LoadLibrary(dll_path)
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError("The pigentl-sdk DLL, CTI, or one or more of their dependencies were not found.")
+    lib = EvaluationKit._register_lib_args(libc)
+
+    # Initializate library
+    err = lib.PiGentlSdkInitializeLibrary()
+    if err != CAM_ERR_SUCCESS:
+        raise Exception(f"PiGentlSdkInitializeLibrary: {err}. Is the camera already in use?")
+    return lib
+
+
+def enumerate_cameras(lib, attempts=10):
+    """Update the camera list of the library, retrying while no camera is found.
+    :param lib: The library returned by load_library.
+    :param attempts: Maximum number of PiGentlSdkUpdateCameraList calls.
+    returns list of tCameraInfo"""
+    ulNbCameras = ctypes.c_ulong(0)
+    numattempts = 0
+    err = CAM_ERR_SUCCESS
+    while ulNbCameras.value == 0 and numattempts < attempts:
+        err = lib.PiGentlSdkUpdateCameraList(ctypes.byref(ulNbCameras))
+        numattempts += 1
+    if err != CAM_ERR_SUCCESS:
+        raise Exception(f"PiGentlSdkUpdateCameraList: {err}")
+    cameras = []
+    for index in range(ulNbCameras.value):
+        camera_info = tCameraInfo()
+        err = lib.PiGentlSdkGetCameraInfo(ctypes.c_ulong(index), ctypes.byref(camera_info))
+        if err != CAM_ERR_SUCCESS:
+            raise Exception(f"PiGentlSdkGetCameraInfo: {err}")
+        cameras.append(camera_info)
+    return cameras
+
+
+def find_camera(cameras, camera):
+    """Select a camera of the list returned by enumerate_cameras.
+    :param camera: Index or serial number of the camera.
+    returns tCameraInfo"""
+    if isinstance(camera, str):
+        for camera_info in cameras:
+            if camera_info.serial.decode() == camera:
+                return camera_info
+        raise Exception(f"No camera with serial number {camera}")
+    if not 0 <= camera < len(cameras):
+        raise Exception(f"No camera at index {camera}, {len(cameras)} camera(s) found")
+    return cameras[camera]
+
+
 class EvaluationKit:
     """A Python wrapper for the pigentl-sdk library."""
 
-    def __init__(self, dll_path=None, cti_path=None):
+    def __init__(self, dll_path=None, cti_path=None, camera=0, lib=None):
         """Constructor
         :param dll_path: Optionally specify the absolute path to the pigentl DLL.
         :param cti_path: Optionally specify the absolute path to the pigentl CTI.
-                      is in the directory of the DLL."""
+                      is in the directory of the DLL.
+        :param camera: Index or serial number of the camera to open, or its tCameraInfo (see enumerate_cameras).
+        :param lib: Optionally share a library already loaded by load_library, e.g. by a CameraPool. It is then not
+                    terminated when the camera is closed."""
         self._is_init = False
+        self._owns_lib = lib is None
         self.camera_opened = False
+        # Reused by every GetBuffer call
+        self._image_infos = tImageInfos()
+        self._image_infos_ref = ctypes.byref(self._image_infos)
+        self._buffer_layouts = {}
+        self.grabber = None
+        self.register_cache = None
+        self.telemetry = None
+        self.dump_telemetry_on_stop = False
+        self.number_of_buffers = 0
+        self.buffers_held = 0
+        self.buffers_held_high_water = 0
+        self.fast_rearm = False
+        self.rearm_timeout = 100
+        # False only when the output queue is known to be empty, i.e. the flush can be skipped
+        self._queue_dirty = True
+        self._stop_ns = None
+        self._rearm = {"count": 0, "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0, "flush_skipped": 0}
 
-        if not os.path.isfile(dll_path):
-            raise FileNotFoundError(f"The pigentl-sdk DLL was not found at the following location: {dll_path}")
-        if not os.path.isfile(cti_path):
-            raise FileNotFoundError(f"The pigentl-sdk CTI was not found at the following location: {cti_path}")
-        try:
-            ctypes.cdll.LoadLibrary(cti_path)
-            libc = ctypes.cdll.LoadLibrary(dll_path)
-        except ModuleNotFoundError:
-            raise ModuleNotFoundError("The pigentl-sdk DLL, CTI, or one or more of their dependencies were not found.")
-        self.lib = self._register_lib_args(libc)
-
-        # Initializate library
-        err = self.lib.PiGentlSdkInitializeLibrary()
+        if lib is None:
+            lib = load_library(dll_path, cti_path)
+        self.lib = lib
+        self._is_init = True
+
+        if isinstance(camera, tCameraInfo):
+            camera_info = camera
+        else:
+            cameras = enumerate_cameras(self.lib)
+            print(str(len(cameras)) + " camera(s) found")
+            camera_info = find_camera(cameras, camera)
+        print("\t\tCamera found: " + camera_info.pcID.decode())
+        self.camera_info = camera_info
+        self._handle = ctypes.c_void_p()
+        err = self.lib.PiGentlSdkOpenCamera(ctypes.byref(camera_info), self._handle)
         if err != CAM_ERR_SUCCESS:
-            raise Exception(f"PiGentlSdkInitializeLibrary: {err}. Is the camera already in use?")
+            raise Exception(f"PiGentlSdkOpenCamera: {err}. Is the camera connected? Is it already in use?")
         else:
-            self._is_init = True
-            # update camera list
-            ulNbCameras = ctypes.c_ulong(0)
-            numattempts = 0
-            while ulNbCameras.value == 0 & numattempts < 10:
-                err = self.lib.PiGentlSdkUpdateCameraList(ctypes.byref(ulNbCameras))
-                numattempts += 1
+            print("\t\t\t\tPiGentlSdkOpenCamera OK")
+            self.camera_opened = True
+            # Before acquiring an image the height of the image and the number of buffers has to be defined
+            err = self.set_number_of_buffers(NBUFFER)
             if err != CAM_ERR_SUCCESS:
-                raise Exception(f"PiGentlSdkUpdateCameraList: {err}")
+                raise Exception(f"PiGentlSdkSetNumberOfBuffers: {err}")
             else:
-                print(str(ulNbCameras.value) + " camera(s) found")
-                # Retrieve camera info
-                camera_info = tCameraInfo()
-                err = self.lib.PiGentlSdkGetCameraInfo(ctypes.c_ulong(0), ctypes.byref(camera_info))
-                if err != CAM_ERR_SUCCESS:
-                    raise Exception(f"PiGentlSdkGetCameraInfo: {err}")
-                else:
-                    print("\t\tCamera found: " + camera_info.pcID.decode())
-                    self._handle = ctypes.c_void_p()
-                    err = self.lib.PiGentlSdkOpenCamera(ctypes.byref(camera_info), self._handle)
-                    if err != CAM_ERR_SUCCESS:
-                        raise Exception(f"PiGentlSdkOpenCamera: {err}. Is the camera connected? Is it already in use?")
-                    else:
-                        print("\t\t\t\tPiGentlSdkOpenCamera OK")
-                        self.camera_opened = True
-                        # Before acquiring an image the height of the image and the number of buffers has to be defined
-                        err = self.lib.PiGentlSdkSetNumberOfBuffers(self._handle, ctypes.c_size_t(NBUFFER))
-                        if err != CAM_ERR_SUCCESS:
-                            raise Exception(f"PiGentlSdkSetNumberOfBuffers: {err}")
-                        else:
-                            print("\t\t\t\t\t\tBuffers allocation OK")
+                print("\t\t\t\t\t\tBuffers allocation OK")
 
     def __del__(self):
-        self.lib.PiGentlSdkCloseCamera(self._handle)
-        self.lib.PiGentlSdkTerminateLibrary()
+        self.close()
+
+    def close(self):
+        """Close the camera, and terminate the library unless it is shared (see CameraPool)."""
+        if self.camera_opened:
+            self.camera_opened = False
+            self.lib.PiGentlSdkCloseCamera(self._handle)
+        if self._is_init and self._owns_lib:
+            self._is_init = False
+            self.lib.PiGentlSdkTerminateLibrary()
 
     @staticmethod
     def _register_lib_args(libc):
@@ -139,6 +294,48 @@ class EvaluationKit:
         libc.PiGentlSdkUpgradeCamera.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_ulong), ctypes.c_char_p]
         return libc
 
+    def _read_register(self, address, size):
+        """Read size bytes at a specified address, bypassing the register cache.
+        returns (error code, raw bytes)"""
+        ulAddress = ctypes.c_ulong(address)
+        size = ctypes.c_size_t(size)
+        byte_buffer = ctypes.create_string_buffer(size.value)
+        err = self.lib.PiGentlSdkReadRegister(self._handle, ulAddress, byte_buffer, ctypes.byref(size))
+        return err, byte_buffer.raw
+
+    def _write_register(self, address, ba):
+        """Write the bytearray ba at a specified address, bypassing the register cache.
+        returns error code"""
+        ulAddress = ctypes.c_ulong(address)
+        char_array = ctypes.c_char * len(ba)
+        byte_buffer = char_array.from_buffer(ba)
+        size = ctypes.c_size_t(ctypes.sizeof(byte_buffer))
+        return self.lib.PiGentlSdkWriteRegister(self._handle, ulAddress, byte_buffer, ctypes.byref(size))
+
+    def set_number_of_buffers(self, count):
+        """This function sets the number of buffers allocated by the SDK, outside of an acquisition.
+        returns error code"""
+        err = self.lib.PiGentlSdkSetNumberOfBuffers(self._handle, ctypes.c_size_t(count))
+        if err == CAM_ERR_SUCCESS:
+            self.number_of_buffers = count
+        return err
+
+    @property
+    def buffer_stats(self):
+        """Number of buffers and their use:
+        held_high_water - maximum number of buffers leased at once (see lease_image), measured
+        backlog_estimate - estimate of the maximum number of frames waiting in the output queue, from the worst
+                           latency and the frame rate measured by the telemetry (0 when disabled). The SDK does not
+                           report the depth of the output queue, this is not a measurement."""
+        backlog = 0
+        if self.telemetry is not None:
+            backlog = math.ceil(self.telemetry.latency_max_ns * 1e-9 * self.telemetry.average_fps)
+        return {
+            "buffers": self.number_of_buffers,
+            "held_high_water": self.buffers_held_high_water,
+            "backlog_estimate": backlog,
+        }
+
     def read(self, address, size, decode=True):
         """This function reads a camera register at a specified address.
         :param address:     The register address to read.
@@ -146,14 +343,17 @@ class EvaluationKit:
         :param decode: Optionally decode the buffer.
         returns (error code, decoded buffer of read data)
         NOTE: The buffer endianness is little endian"""
-        ulAddress = ctypes.c_ulong(address)
-        size = ctypes.c_size_t(size)
-        byte_buffer = ctypes.create_string_buffer(size.value)
-        err = self.lib.PiGentlSdkReadRegister(self._handle, ulAddress, byte_buffer, ctypes.byref(size))
+        raw = None if self.register_cache is None else self.register_cache.lookup(address, size)
+        if raw is not None:
+            err = CAM_ERR_SUCCESS
+        else:
+            err, raw = self._read_register(address, size)
+            if err == CAM_ERR_SUCCESS and self.register_cache is not None:
+                self.register_cache.store(address, raw)
         if decode:
-            data = byte_buffer.raw.decode()
+            data = raw.decode()
         else:
-            data = byte_buffer.raw
+            data = raw
         return err, data
 
     def write(self, address, data):
@@ -170,13 +370,31 @@ class EvaluationKit:
             ba = bytearray(struct.pack("<H", data))
         else:  # unsigned integer
             ba = bytearray(struct.pack("<I", data))
-        ulAddress = ctypes.c_ulong(address)
-        char_array = ctypes.c_char * len(ba)
-        byte_buffer = char_array.from_buffer(ba)
-        size = ctypes.c_size_t(ctypes.sizeof(byte_buffer))
-        err = self.lib.PiGentlSdkWriteRegister(self._handle, ulAddress, byte_buffer, ctypes.byref(size))
+        err = self._write_register(address, ba)
+        if self.register_cache is not None:
+            if err == CAM_ERR_SUCCESS:
+                self.register_cache.store(address, ba)
+            else:
+                self.register_cache.discard(address)
         return err
 
+    def enable_register_cache(self, static_addresses=(), volatile_addresses=()):
+        """This function enables a shadow copy of the registers: reads of known registers are answered without a
+        transfer and writes update the copy.
+        :param static_addresses: Addresses whose value never changes while the camera is opened.
+        :param volatile_addresses: Addresses which must always be read from the camera.
+        returns the RegisterCache, see its hits/misses counters"""
+        self.register_cache = RegisterCache(static_addresses, volatile_addresses)
+        return self.register_cache
+
+    def disable_register_cache(self):
+        self.register_cache = None
+
+    def invalidate_register_cache(self):
+        """Forget the cached registers, e.g. after a configuration changed them behind our back."""
+        if self.register_cache is not None:
+            self.register_cache.invalidate()
+
     def start_acquisition(self):
         """This function starts the acquisition engine for the specified camera.
         returns error code
@@ -184,47 +402,304 @@ class EvaluationKit:
               the "OutputQueue" where they can be retrieved with getBuffer.
         NOTE: Before starting acquisition the SDK internally calls flushBuffers to restore all buffers from the
               output queue to the input queue"""
-        err = self.lib.PiGentlSdkFlushBuffers(self._handle)
-        time.sleep(0.1)
+        start = time.perf_counter_ns()
+        if not self.fast_rearm:
+            err = self.lib.PiGentlSdkFlushBuffers(self._handle)
+            time.sleep(REARM_DELAY)
+        elif self._queue_dirty:
+            err = self.lib.PiGentlSdkFlushBuffers(self._handle)
+        else:
+            self._rearm["flush_skipped"] += 1
         err = self.lib.PiGentlSdkStartAcquisition(self._handle)
+        self._queue_dirty = True
+        if self._stop_ns is not None and self.fast_rearm:
+            self._record_rearm(self._stop_ns + time.perf_counter_ns() - start)
+            self._stop_ns = None
         return err
 
     def stop_acquisition(self):
         """This function stops the acquisition engine for the specified camera.
         NOTE: SDK automatically allocates the size of the memory for each buffer specified by setNumberOfBuffers.
+        NOTE: With fast re-arm the frames still in flight are drained instead of waiting a fixed delay, see
+              enable_fast_rearm.
         returns error code"""
+        start = time.perf_counter_ns()
         err = self.lib.PiGentlSdkStopAcquisition(self._handle)
-        time.sleep(0.1)
-        err = self.lib.PiGentlSdkFlushBuffers(self._handle)
+        if not self.fast_rearm:
+            time.sleep(REARM_DELAY)
+            err = self.lib.PiGentlSdkFlushBuffers(self._handle)
+        elif not self._drain_output_queue(self.rearm_timeout):
+            err = self.lib.PiGentlSdkFlushBuffers(self._handle)
+            self._queue_dirty = err != CAM_ERR_SUCCESS
+        else:
+            self._queue_dirty = False
+        # Only the fast re-arms are measured
+        self._stop_ns = time.perf_counter_ns() - start if self.fast_rearm else None
+        if self.telemetry is not None and self.dump_telemetry_on_stop:
+            self.telemetry.dump()
+        return err
+
+    def _drain_output_queue(self, timeout):
+        """Requeue the buffers left in the output queue of a stopped engine until GetBuffer times out.
+        :param timeout: Maximum time in ms spent draining.
+        returns True when the output queue is empty, False when it may not be (deadline or SDK error)"""
+        poll = 1  # ms
+        deadline = time.perf_counter() + timeout * 1e-3
+        while time.perf_counter() < deadline:
+            start = time.perf_counter_ns()
+            if self.lib.PiGentlSdkGetBuffer(self._handle, self._image_infos_ref, poll) != CAM_ERR_SUCCESS:
+                # Only a timeout means the engine is idle, any other error leaves the flush to the SDK
+                return _timed_out(start, poll)
+            if self.lib.PiGentlSdkRequeueBuffer(self._handle, self._image_infos.hBuffer) != CAM_ERR_SUCCESS:
+                return False
+        return False
+
+    def _record_rearm(self, duration_ns):
+        duration_ms = duration_ns * 1e-6
+        self._rearm["count"] += 1
+        self._rearm["last_ms"] = duration_ms
+        self._rearm["max_ms"] = max(self._rearm["max_ms"], duration_ms)
+        self._rearm["total_ms"] += duration_ms
+
+    def enable_fast_rearm(self, timeout=100):
+        """This function replaces the fixed delays of start_acquisition and stop_acquisition: the stop drains the
+        frames still in flight until the engine is idle, and the next start skips the flush when the output queue is
+        known to be empty.
+        :param timeout: Maximum time in ms waiting for the engine to be idle, the buffers are flushed afterwards."""
+        self.fast_rearm = True
+        self.rearm_timeout = timeout
+
+    def disable_fast_rearm(self):
+        self.fast_rearm = False
+        self._queue_dirty = True
+        self._stop_ns = None
+
+    def rearm_stats(self):
+        """Measured fast re-arm latency, i.e. the time spent in stop_acquisition and the following start_acquisition
+        while fast re-arm is enabled:
+        count - number of re-arms
+        last_ms, max_ms, mean_ms - latency in ms
+        flush_skipped - number of starts which did not need to flush the buffers"""
+        stats = dict(self._rearm)
+        stats["mean_ms"] = stats["total_ms"] / stats["count"] if stats["count"] else 0.0
+        return stats
+
+    def enable_telemetry(self, timestamp_frequency=1e9, window=32, dump_on_stop=False):
+        """This function enables frame-level telemetry: lost and incomplete frames, frame rate, bandwidth, latency and
+        time spent in GetBuffer versus user processing.
+        :param timestamp_frequency: Frequency in Hz of the device timestamp.
+        :param window: Number of frames of the sliding window of the instantaneous rates.
+        :param dump_on_stop: Print the telemetry at each stop_acquisition.
+        returns FrameTelemetry, query its stats property live"""
+        self.telemetry = FrameTelemetry(timestamp_frequency=timestamp_frequency, window=window)
+        self.dump_telemetry_on_stop = dump_on_stop
+        return self.telemetry
+
+    def disable_telemetry(self):
+        self.telemetry = None
+
+    def enable_instrumentation(self, callback=None):
+        """This function wraps every PiGentlSdk* function to record its call count, error count and latency
+        histogram. When disabled the library is called directly, without any overhead.
+        :param callback: Optional function called after each SDK call with (name, error code, start ns, duration ns),
+                         e.g. a TraceEvents.
+        returns InstrumentedLibrary, see its calls and report()"""
+        if not isinstance(self.lib, InstrumentedLibrary):
+            self.lib = InstrumentedLibrary(self.lib)
+        if callback is not None:
+            self.lib.callbacks.append(callback)
+        return self.lib
+
+    def disable_instrumentation(self):
+        if isinstance(self.lib, InstrumentedLibrary):
+            self.lib = self.lib.lib
+
+    def _get_buffer(self, timeout):
+        """Wait for the next filled buffer of the output queue.
+        NOTE: The tImageInfos struct is reused across calls, read its fields before the next call.
+        returns the tImageInfos describing the buffer"""
+        start = time.perf_counter_ns()
+        err = self.lib.PiGentlSdkGetBuffer(self._handle, self._image_infos_ref, timeout)
+        if err != CAM_ERR_SUCCESS:
+            if _timed_out(start, timeout):
+                raise GetBufferTimeout(f"getBuffer: {err}")
+            raise Exception(f"getBuffer: {err}")
+        if self.telemetry is not None:
+            self.telemetry.record(self._image_infos, start, time.perf_counter_ns())
+        return self._image_infos
+
+    def _requeue_buffer(self, hBuffer):
+        """Give a buffer back to the input queue of the acquisition engine.
+        returns error code"""
+        err = self.lib.PiGentlSdkRequeueBuffer(self._handle, hBuffer)
+        if err != CAM_ERR_SUCCESS:
+            raise Exception(f"PiGentlSdkRequeueBuffer: {err}")
         return err
 
+    def _buffer_layout(self, ImageInfos):
+        """Shape, dtype and packed pixel decoder of the image held by a buffer, cached per image size and type.
+        returns (shape, dtype, unpack), unpack is None when the pixels are not packed"""
+        key = (ImageInfos.iImageSize, ImageInfos.iImageWidth, ImageInfos.iImageHeight, ImageInfos.eImagePixelType)
+        layout = self._buffer_layouts.get(key)
+        if layout is None:
+            bitsPerPixel = ImageInfos.iImageSize * 8 / (ImageInfos.iImageHeight * ImageInfos.iImageWidth)
+            bytesPerPixel = int(bitsPerPixel / 8)
+            unpack = packed_nbits_unpack.get(bitsPerPixel)
+            if ImageInfos.eImagePixelType == tImagePixelType.eMono10p:
+                unpack = unpack_mono10p
+            if unpack is None and bitsPerPixel % 8 != 0:
+                # The buffer size does not identify a packed format (e.g. trailing padding): use the camera pixel format
+                unpack = packed_pixel_format_unpack.get(getattr(self, "pixel_format", None))
+            if unpack is not None:  # Mono10p/Mono12p
+                layout = (ImageInfos.iImageHeight, ImageInfos.iImageWidth), np.dtype(np.uint16), unpack
+            elif bytesPerPixel == 3:  # RGB 8bit/Color
+                layout = (ImageInfos.iImageHeight, ImageInfos.iImageWidth * bytesPerPixel), np.dtype(np.uint8), None
+            elif bytesPerPixel == 1:  # 8bit
+                layout = (ImageInfos.iImageHeight, ImageInfos.iImageWidth), np.dtype(np.uint8), None
+            else:  # 16bit
+                layout = (ImageInfos.iImageHeight, ImageInfos.iImageWidth), np.dtype(np.uint16), None
+            self._buffer_layouts[key] = layout
+        return layout
+
+    def _buffer_view(self, ImageInfos):
+        """Read-only numpy view onto the pixels of a buffer (no copy).
+        NOTE: For packed pixel formats this is the flat array of packed bytes."""
+        shape, dtype, unpack = self._buffer_layout(ImageInfos)
+        if unpack is not None:
+            return make_nd_view(ImageInfos.pDatas, (ImageInfos.iImageSize,), dtype=np.uint8, order="C")
+        return make_nd_view(ImageInfos.pDatas, shape, dtype=dtype, order="C")
+
+    def _copy_buffer(self, ImageInfos, out):
+        """Copy (or unpack) the pixels of a buffer into a caller-provided array."""
+        shape, dtype, unpack = self._buffer_layout(ImageInfos)
+        if unpack is not None:
+            unpack(self._buffer_view(ImageInfos), out)
+        elif out.shape == shape and out.dtype == dtype and out.flags.c_contiguous:
+            ctypes.memmove(out.ctypes.data, ImageInfos.pDatas, out.nbytes)
+        else:
+            np.copyto(out, self._buffer_view(ImageInfos))
+
+    def _decode_buffer(self, ImageInfos):
+        """Copy (or unpack) the pixels of a buffer into a new array."""
+        shape, dtype, _ = self._buffer_layout(ImageInfos)
+        image = np.empty(shape, dtype=dtype)
+        self._copy_buffer(ImageInfos, image)
+        return image
+
+    def discard_queued_frames(self):
+        """This function requeues the frames already waiting in the output queue without reading them, e.g. the
+        frames acquired before a settings change. The telemetry accounts for them as received frames.
+        returns the number of frames discarded"""
+        count = 0
+        while count < self.number_of_buffers:
+            start = time.perf_counter_ns()
+            if self.lib.PiGentlSdkGetBuffer(self._handle, self._image_infos_ref, 0) != CAM_ERR_SUCCESS:
+                break
+            if self.telemetry is not None:
+                self.telemetry.record(self._image_infos, start, time.perf_counter_ns())
+            self._requeue_buffer(self._image_infos.hBuffer)
+            count += 1
+        return count
+
     def get_image(self, timeout=5000):
         """This function get an image from preallocated buffer.
-        """
-        image = None
-        ImageInfos = tImageInfos()
-        err = self.lib.PiGentlSdkGetBuffer(self._handle, ctypes.byref(ImageInfos), timeout)
-        if err == CAM_ERR_SUCCESS:
-            data = ctypes.cast(ImageInfos.pDatas, ctypes.POINTER(ctypes.c_ubyte))
-            bytesPerPixel = int((ImageInfos.iImageSize / (ImageInfos.iImageHeight * ImageInfos.iImageWidth)))
-            # Get image from byte buffer
-            if bytesPerPixel == 3:  # RGB 8bit/Color
-                shape = (ImageInfos.iImageHeight, ImageInfos.iImageWidth * bytesPerPixel)
-                image = make_nd_array(data, shape, dtype=np.uint8, order="C")
-            else:
-                if bytesPerPixel == 1: # 8bit
-                    shape = (ImageInfos.iImageHeight, ImageInfos.iImageWidth)
-                    image = make_nd_array(data, shape, dtype=np.uint8, order="C")
-                else: # 16bit
-                    shape = (ImageInfos.iImageHeight, ImageInfos.iImageWidth)
-                    image = make_nd_array(data, shape, dtype=np.uint16, order="C")
-            err = self.lib.PiGentlSdkRequeueBuffer(self._handle, ImageInfos.hBuffer)
-            if err != CAM_ERR_SUCCESS:
-                raise Exception(f"PiGentlSdkRequeueBuffer: {err}")
-        else:
-            raise Exception(f"getBuffer: {err}")
+        The image is copied out of the SDK buffer, which is requeued before returning.
+        returns (error code, image)"""
+        ImageInfos = self._get_buffer(timeout)
+        image = self._decode_buffer(ImageInfos)
+        err = self._requeue_buffer(ImageInfos.hBuffer)
         return err, image
 
+    def lease_image(self, timeout=5000):
+        """This function get an image from preallocated buffer without copying it.
+        The returned Frame holds a read-only view onto the SDK buffer, which is only requeued when the frame is
+        released. Use it as a context manager or call release() as soon as the image is not needed anymore:
+            with camera.lease_image() as frame:
+                process(frame.image)
+        NOTE: Buffers which are not released are lost for the acquisition engine (see NBUFFER).
+        NOTE: Packed pixel formats (Mono10p/Mono12p) cannot be viewed: they are unpacked into a new array and the
+              buffer is requeued immediately.
+        returns Frame"""
+        ImageInfos = self._get_buffer(timeout)
+        if self._buffer_layout(ImageInfos)[2] is not None:
+            try:
+                return Frame(self._decode_buffer(ImageInfos), ImageInfos)
+            finally:
+                self._requeue_buffer(ImageInfos.hBuffer)
+        hBuffer = ImageInfos.hBuffer
+        self.buffers_held += 1
+        self.buffers_held_high_water = max(self.buffers_held_high_water, self.buffers_held)
+
+        def release():
+            self.buffers_held -= 1
+            self._requeue_buffer(hBuffer)
+
+        return Frame(self._buffer_view(ImageInfos), ImageInfos, release=release)
+
+    def get_frame(self, timeout=5000):
+        """This function get an image from preallocated buffer together with its buffer information.
+        The image is copied out of the SDK buffer, which is requeued before returning.
+        returns Frame"""
+        ImageInfos = self._get_buffer(timeout)
+        try:
+            frame = Frame(self._decode_buffer(ImageInfos), ImageInfos)
+        finally:
+            self._requeue_buffer(ImageInfos.hBuffer)
+        return frame
+
+    def get_image_into(self, out, timeout=5000, info=None):
+        """This function copies an image from preallocated buffer straight into a caller-provided array.
+        :param out: The destination array, e.g. a slice of a preallocated or memory-mapped stack. Its shape must be
+                    the one returned by get_image. Packed pixels (Mono10p/Mono12p) are unpacked into it.
+        :param timeout: Timeout in ms.
+        :param info: Optional record of frame_info_dtype receiving the buffer information.
+        returns error code"""
+        ImageInfos = self._get_buffer(timeout)
+        try:
+            self._copy_buffer(ImageInfos, out)
+            if info is not None:
+                _store_frame_info(info, ImageInfos)
+        finally:
+            err = self._requeue_buffer(ImageInfos.hBuffer)
+        return err
+
+    def grab_burst(self, n, out, timeout=5000, info=None):
+        """This function acquires n consecutive images into out[0] ... out[n-1].
+        :param n: Number of images to acquire.
+        :param out: The destination array of shape (N >= n, H, W), e.g. preallocated or memory-mapped.
+        :param timeout: Timeout in ms for each image.
+        :param info: Optional array of frame_info_dtype (N >= n) receiving the buffer information of each image.
+        returns error code"""
+        if n > len(out):
+            raise Exception(f"grab_burst: cannot store {n} images in an array of {len(out)}")
+        err = CAM_ERR_SUCCESS
+        for i in range(n):
+            err = self.get_image_into(out[i], timeout, None if info is None else info[i : i + 1])
+        return err
+
+    def start_grabber(self, queue_size=16, policy="block", timeout=1000):
+        """This function starts the acquisition and a background thread grabbing the images.
+        :param queue_size: Maximum number of frames waiting to be consumed.
+        :param policy: What to do when the queue is full: "block", "drop-oldest" or "drop-newest".
+        :param timeout: Timeout in ms of each GetBuffer call.
+        returns FrameGrabber, use its get() or iterate over it to consume the frames"""
+        if self.grabber is not None and self.grabber.running:
+            raise Exception("A grabber is already running")
+        err = self.start_acquisition()
+        if err != CAM_ERR_SUCCESS:
+            raise Exception(f"PiGentlSdkStartAcquisition: {err}")
+        self.grabber = FrameGrabber(self, queue_size=queue_size, policy=policy, timeout=timeout)
+        self.grabber.start()
+        return self.grabber
+
+    def stop_grabber(self):
+        """This function stops the grabber thread and the acquisition.
+        Frames still queued remain available from the grabber.
+        returns error code"""
+        if self.grabber is not None:
+            self.grabber.stop()
+        return self.stop_acquisition()
+
     def get_error_text(self, error_code):
         """This function gets the text corresponding to an error.
         :param error_code:  The error.
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class FrameStats:
+    """Single-pass statistics of a frame: min, max, sum, sum of squares, row and column profiles and an optional
+    histogram. The frame is processed by chunks of rows which stay in cache while every statistic is computed, and
+    the results are written into buffers allocated once:
+        stats = FrameStats((H, W))
+        for frame, s in stats.attach(grabber):
+            print(s.min, s.max, s.mean, s.std)"""
+
+    def __init__(self, shape, histogram_bins=None, chunk_rows=64):
+        """Constructor
+        :param shape: Shape of the frames, (H, W) or (H, W, 3).
+        :param histogram_bins: Number of bins of the histogram of integer pixel values (e.g. 1 << nbits), None to
+                               disable it. Values above the last bin are counted in the last bin.
+        :param chunk_rows: Number of rows processed at once."""
+        self.shape = tuple(shape)
+        self.chunk_rows = chunk_rows
+        self.count = int(np.prod(self.shape))
+        self.min = 0
+        self.max = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.row_profile = np.zeros(self.shape[0], dtype=np.float64)
+        self.col_profile = np.zeros(self.shape[1:], dtype=np.float64)
+        self.histogram = None if histogram_bins is None else np.zeros(histogram_bins, dtype=np.int64)
+        self._chunk = np.empty((chunk_rows,) + self.shape[1:], dtype=np.float64)
+        self._col_sum = np.empty(self.shape[1:], dtype=np.float64)
+
+    @property
+    def mean(self):
+        return self.sum / self.count
+
+    @property
+    def var(self):
+        return max(self.sum_sq / self.count - self.mean**2, 0.0)
+
+    @property
+    def std(self):
+        return self.var**0.5
+
+    @property
+    def results(self):
+        return {"min": self.min, "max": self.max, "mean": self.mean, "std": self.std}
+
+    def update(self, image):
+        """Compute the statistics of a frame.
+        returns self"""
+        if image.shape != self.shape:
+            raise ValueError(f"FrameStats expects frames of shape {self.shape}, got {image.shape}")
+        axes = tuple(range(1, image.ndim))
+        row_size = self.count // self.shape[0]
+        vmin, vmax = None, None
+        total = 0.0
+        total_sq = 0.0
+        self.col_profile[...] = 0
+        if self.histogram is not None:
+            self.histogram[:] = 0
+        for start in range(0, self.shape[0], self.chunk_rows):
+            chunk = image[start : start + self.chunk_rows]
+            n = len(chunk)
+            cmin, cmax = chunk.min(), chunk.max()
+            vmin = cmin if vmin is None else min(vmin, cmin)
+            vmax = cmax if vmax is None else max(vmax, cmax)
+            # Work on a float64 copy of the chunk, still in cache
+            f = self._chunk[:n]
+            np.copyto(f, chunk)
+            rows = self.row_profile[start : start + n]
+            np.sum(f, axis=axes, out=rows)
+            total += rows.sum()
+            np.sum(f, axis=0, out=self._col_sum)
+            self.col_profile += self._col_sum
+            flat = f.reshape(-1)
+            total_sq += np.dot(flat, flat)
+            if self.histogram is not None:
+                counts = np.bincount(chunk.reshape(-1), minlength=len(self.histogram))
+                self.histogram += counts[: len(self.histogram)]
+                self.histogram[-1] += counts[len(self.histogram) :].sum()
+        self.row_profile /= row_size
+        self.col_profile /= self.shape[0]
+        self.min, self.max = vmin.item(), vmax.item()
+        self.sum, self.sum_sq = float(total), float(total_sq)
+        return self
+
+    def attach(self, frames):
+        """Compute the statistics of every frame of a stream (FrameGrabber, list of Frame or of images).
+        NOTE: The statistics are overwritten by the next frame.
+        returns a generator of (frame, self)"""
+        for frame in frames:
+            self.update(getattr(frame, "image", frame))
+            yield frame, self
@@ -0,0 +1,131 @@
+import queue
+import threading
+
+# Behaviour of the grabber when its frame queue is full
+GRAB_POLICIES = ("block", "drop-oldest", "drop-newest")
+# Delay in s before retrying after a GetBuffer failure which is not a timeout
+ERROR_BACKOFF = 0.1
+
+
+class FrameGrabber:
+    """Runs the GetBuffer/requeue loop of an EvaluationKit on a dedicated thread.
+    Frames are copied out of the SDK buffers, which are requeued immediately, and pushed into a bounded queue. When
+    the queue is full the policy decides what happens:
+        "block"       - the grabber waits for the consumer (SDK buffers eventually fill up)
+        "drop-oldest" - the oldest queued frame is discarded to make room
+        "drop-newest" - the new frame is discarded
+    Frames discarded on the Python side are counted in frames_dropped."""
+
+    def __init__(self, ek, queue_size=16, policy="block", timeout=1000):
+        """Constructor
+        :param ek: The EvaluationKit to grab from. Its acquisition must be started.
+        :param queue_size: Maximum number of frames waiting for the consumer.
+        :param policy: One of GRAB_POLICIES.
+        :param timeout: Timeout in ms of each GetBuffer call, bounds the time needed to stop."""
+        if policy not in GRAB_POLICIES:
+            raise ValueError(f"Unknown grab policy {policy!r}, expected one of {GRAB_POLICIES}")
+        self.ek = ek
+        self.policy = policy
+        self.timeout = timeout
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.frames_grabbed = 0
+        self.bytes_grabbed = 0
+        self.frames_dropped = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.last_error = None
+        self.queue_high_water = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stats(self):
+        return {
+            "frames_grabbed": self.frames_grabbed,
+            "bytes_grabbed": self.bytes_grabbed,
+            "frames_dropped": self.frames_dropped,
+            "frames_queued": self.frames.qsize(),
+            "queue_high_water": self.queue_high_water,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the grabber thread. Frames still queued remain available to get()."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get(self, timeout=None):
+        """Get the next frame.
+        :param timeout: Timeout in s, None waits forever.
+        returns Frame
+        raises queue.Empty on timeout"""
+        return self.frames.get(timeout=timeout)
+
+    def __iter__(self):
+        """Iterate over the frames until the grabber is stopped and the queue is drained."""
+        while True:
+            try:
+                yield self.frames.get(timeout=0.1)
+            except queue.Empty:
+                if not self.running:
+                    return
+
+    def _run(self):
+        from evaluationkit import GetBufferTimeout  # evaluationkit imports this module
+
+        while not self._stop_event.is_set():
+            try:
+                frame = self.ek.get_frame(self.timeout)
+            except GetBufferTimeout:  # no frame yet, routine
+                self.timeouts += 1
+                continue
+            except Exception as e:  # acquisition error, e.g. not started or camera unplugged
+                self.errors += 1
+                self.last_error = e
+                self._stop_event.wait(ERROR_BACKOFF)
+                continue
+            self.frames_grabbed += 1
+            self.bytes_grabbed += frame.size
+            self._push(frame)
+
+    def _push(self, frame):
+        if self.policy == "block":
+            while not self._stop_event.is_set():
+                try:
+                    self.frames.put(frame, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            else:
+                self.frames_dropped += 1
+        elif self.policy == "drop-newest":
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                self.frames_dropped += 1
+        else:  # drop-oldest
+            while True:
+                try:
+                    self.frames.put_nowait(frame)
+                    break
+                except queue.Full:
+                    try:
+                        self.frames.get_nowait()
+                        self.frames_dropped += 1
+                    except queue.Empty:
+                        pass
+        self.queue_high_water = max(self.queue_high_water, self.frames.qsize())
@@ -0,0 +1,85 @@
+import numpy as np
+
+# used to get the number of significant bits from the EK/XML pixel format
+xml_pixel_format_hist_bits = {
+    "Unknown": 8,
+    "Mono8": 8,
+    "Mono10": 10,
+    "Mono12": 12,
+    "Mono14": 14,
+    "Mono16": 16,
+    "RGB24": 8,
+    "YUV444": 16,
+    "Mono10p": 10,
+    "Mono12p": 12,
+}
+
+
+class HistogramEngine:
+    """Histogram of integer pixel values computed with np.bincount, one bin per code (256 / 1024 / 4096 / 16384
+    bins for 8 / 10 / 12 / 14 bits). It can be accumulated over frames and computed on a decimated subsample for
+    live use; plotting only redraws the precomputed counts:
+        hist = HistogramEngine.from_pixel_format(camera.pixel_format, decimation=4)
+        for frame in grabber:
+            hist.update(frame.image, accumulate=False)
+            hist.plot(ax, log=True)"""
+
+    def __init__(self, bits=12, decimation=1):
+        """Constructor
+        :param bits: Number of significant bits of the pixels, the histogram has 1 << bits bins. Larger values are
+                     counted in the last bin.
+        :param decimation: Only take one row and one column out of decimation."""
+        self.bits = bits
+        self.decimation = decimation
+        self.counts = np.zeros(1 << bits, dtype=np.int64)
+        self.frames = 0
+        self._artists = {}
+
+    @staticmethod
+    def from_pixel_format(pixel_format, decimation=1):
+        return HistogramEngine(xml_pixel_format_hist_bits[pixel_format], decimation=decimation)
+
+    @property
+    def nbins(self):
+        return len(self.counts)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def reset(self):
+        self.counts[:] = 0
+        self.frames = 0
+
+    def update(self, image, accumulate=True):
+        """Add the pixels of a frame (or a Frame) to the histogram.
+        :param accumulate: Set to False to replace the counts by the ones of this frame.
+        returns the counts"""
+        image = getattr(image, "image", image)
+        if self.decimation > 1:
+            image = image[:: self.decimation, :: self.decimation]
+        counts = np.bincount(image.reshape(-1), minlength=self.nbins)
+        if not accumulate:
+            self.reset()
+        self.counts += counts[: self.nbins]
+        if len(counts) > self.nbins:
+            self.counts[-1] += counts[self.nbins :].sum()
+        self.frames += 1
+        return self.counts
+
+    def plot(self, ax=None, log=False):
+        """Draw the counts as a step curve. Later calls on the same axes only update the curve."""
+        if ax is None:
+            import matplotlib.pyplot as plt
+
+            ax = plt.gca()
+        line = self._artists.get(id(ax))
+        if line is None or line.axes is not ax:
+            (line,) = ax.plot(np.arange(self.nbins), self.counts, color="k", drawstyle="steps-mid")
+            ax.set_xlim(0, self.nbins - 1)
+            self._artists[id(ax)] = line
+        else:
+            line.set_ydata(self.counts)
+        ax.set_yscale("log" if log else "linear")
+        ax.set_ylim(0.5 if log else 0, max(self.counts.max(), 1) * 1.05)
+        return line
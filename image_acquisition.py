@@ -6,16 +6,22 @@ Created on Aug 2024
 """
 from sensor import *
 from utils import *
+from plotting import imageProfile
 from time import sleep
-from PIL import Image
+from recorder import FrameRecorder
+from framestats import FrameStats
+from ptc import PhotonTransferCurve
+from liveview import LiveView
+from sweep import ParameterSweep
 
 # USER PARAMETERS
 from sensor import OnyxMax
 
 NIMAGES = 1  # Number of images to be acquired
-INTERVAL_PLOT = 0.0001  # Refresh rate in ms
+INTERVAL_PLOT = 0.05  # Minimum time between two display refreshes in s
 EXPOSURE_TIME = 20  # Integration time in ms
 IMAGE_OFFSET = 50 # Offset value to apply to the image
+SETTLE_FRAMES = 2  # Frames discarded after each parameter change of the sweep
 
 # Specific init config for range gating
 init_config = [
@@ -41,6 +47,10 @@ if __name__ == "__main__":
     camera = OnyxMax()
 
     if camera is not None:
+        # Answer repeated register reads (format, geometry, line length) without USB transfers
+        camera.enable_register_cache()
+        # Print frame rate, bandwidth, lost frames and latency at each stop_acquisition
+        camera.enable_telemetry(dump_on_stop=True)
 
         addr=0x7F
         rval=camera.read_sensor_reg(addr) #Read chipID
@@ -70,75 +80,75 @@ if __name__ == "__main__":
         temp = camera.read_thermo()
         print("temp= " + str(temp) + "°C")
 
-        # Pixel format and acquisition image size
-        if camera.pixel_format == "RGB24":
-            shape = (NIMAGES, camera.sensor_height, camera.sensor_width * 3)
-        else:
-            shape = (NIMAGES, camera.sensor_height, camera.sensor_width)
-        
-        im = np.zeros(shape, dtype=xml_pixel_format_nptypes[camera.pixel_format])
-
         # Get current setting
         print_info(camera)
 
+        # Images are saved asynchronously while the next ones are processed
+        recorder = FrameRecorder(".", encoder="tiff")
+        # Live display, throttled: frames arriving faster than the refresh rate are skipped
+        live = LiveView(max_fps=1 / INTERVAL_PLOT)
+
+        # Single-pass statistics, buffers allocated once
+        stats = None
+        # Per-pixel temporal mean/variance of each exposure step (needs NIMAGES >= 2)
+        ptc = None
+
         # define a parameter to sweep here - remove this part in no parameter needed
         param_exposure = [10, 20, 30, 50, 100]
-        for p in param_exposure:
-            camera.exposure_time = p
-            print("\nparam: exposure=" + str(p))
-            sleep(0.1)
-
-            # Image acquisition - NBIMAGES (for each parameter)
-            print("\nImage acquisition:")
-            if camera.start_acquisition() == 0:
+        sweep = ParameterSweep(camera, [{"exposure_time": p} for p in param_exposure], NIMAGES, SETTLE_FRAMES)
+
+        # Image acquisition - NBIMAGES for each parameter, the acquisition runs once for the whole sweep and each
+        # image is processed as it arrives
+        print("\nImage acquisition:")
+        step = None
+        for frame in sweep.frames():
+            p = frame.settings["exposure_time"]
+            if frame.step != step:
+                step = frame.step
                 NBImageAcquired = 0
-                for i in range(0, NIMAGES):
-                    # Get image from internal buffer
-                    im[i, :, :] = camera.get_image()[1]
-                    NBImageAcquired += 1
-                    print("\r\t" + str(NBImageAcquired) + "/" + str(NIMAGES) + " images acquired", end="\t\t\t")
-                print("")
-
-                # Terminate acquisition and start image processing
-                if camera.stop_acquisition() == 0:
-                    NBImageAcquired = 0
-
-                    #to play with numpy and matplotlib
-                    fig = init_figure(camera)
-
-                for i in range(0, NIMAGES):
-                    NBImageAcquired += 1
-
-                    """
-                    Insert your processing code here
-                    image is the current image acquired
-                    """
-
-                    image = image_rearange(im[i, :, :], camera.pixel_format)
-                    imageProfile(image)
-                    update_figure(fig, image, INTERVAL_PLOT, NBImageAcquired)
-
-                    print("\r\t\tEK-image_" + "exp-" + str(p) + "_" + str(NBImageAcquired))
-                    print("\t\t\tMin={}".format(np.min(image)))
-                    print("\t\t\tMax={} ".format(np.max(image)))
-                    print("\t\t\tMean={:.2f} ".format(np.mean(image)))
-                    print("\t\t\tStdDev={:.2f} ".format(np.std(image)))
-
-                    # Convert to PIL object to save image in a tiff file
-                    # img = Image.fromarray(image, 'RGB')
-                    img = Image.fromarray(image, )
-
-                    #imgName = "EK-image_" + str(NBImageAcquired) + ".tiff"
-                    imgName = "EK-image_" + "exp-" + str(p) + "_" + str(NBImageAcquired) + ".tiff"
-                    img.save(imgName)
-                    print("\r\t" + str(NBImageAcquired) + "/" + str(NIMAGES) + " images processed")
-
-                    # This method will show image in any image viewer
-                    # img.show()
-            else:
-                raise Exception("Image acquisition error. Please reboot the camera")
+                print("\nparam: exposure=" + str(p))
+            NBImageAcquired += 1
+
+            """
+            Insert your processing code here
+            image is the current image acquired
+            """
+
+            image = image_rearange(frame.image, camera.pixel_format)
+            if stats is None or stats.shape != image.shape:
+                stats = FrameStats(image.shape)
+            stats.update(image)
+            if ptc is None:
+                ptc = PhotonTransferCurve(image.shape)
+            if NBImageAcquired == 1:
+                ptc.start_step(p)
+            ptc.add(image)
+            imageProfile(image, stats)
+            live.submit(image, NBImageAcquired)
+            live.refresh()
+
+            print("\r\t\tEK-image_" + "exp-" + str(p) + "_" + str(NBImageAcquired))
+            print("\t\t\tMin={}".format(stats.min))
+            print("\t\t\tMax={} ".format(stats.max))
+            print("\t\t\tMean={:.2f} ".format(stats.mean))
+            print("\t\t\tStdDev={:.2f} ".format(stats.std))
+
+            # Save image in a tiff file from the recorder threads
+            #imgName = "EK-image_" + str(NBImageAcquired)
+            imgName = "EK-image_" + "exp-" + str(p) + "_" + str(NBImageAcquired)
+            recorder.write(image, imgName)
+            print("\r\t" + str(NBImageAcquired) + "/" + str(NIMAGES) + " images processed")
+
+        # Photon transfer curve of the exposure sweep
+        ptc.end_step()
+        for exposure, mean, variance in ptc.points:
+            print("exposure={} ms: mean={:.2f} variance={:.2f}".format(exposure, mean, variance))
+        if len(ptc.points) >= 2:
+            print("conversion gain={:.3f} e-/LSB, read noise={:.2f} LSB".format(*ptc.conversion_gain()))
 
         # Terminate connection
+        recorder.close()
+        live.close()
         camera.close()
     else:
         raise Exception("Camera initialization error. Please reboot the camera")
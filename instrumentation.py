@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+
+# Number of latency buckets: bucket i counts the calls lasting less than 2**i ns (and at least 2**(i-1) ns)
+LATENCY_BUCKETS = 40
+
+
+class CallStats:
+    """Call count, error count and latency histogram (power of 2 buckets in ns) of one SDK entry point."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * LATENCY_BUCKETS
+
+    @property
+    def mean_ns(self):
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile_ns(self, q):
+        """returns the upper bound of the bucket holding the q-th percentile (0-100)"""
+        target = self.count * q / 100.0
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if n and seen >= target:
+                return min(1 << i, self.max_ns)
+        return 0
+
+
+class InstrumentedLibrary:
+    """Stands for the pigentl-sdk library and wraps each PiGentlSdk* function on first use, recording its call
+    count, error count and latency, and calling the user callbacks with (name, error code, start ns, duration ns)."""
+
+    def __init__(self, lib):
+        self.lib = lib
+        self.calls = {}
+        self.callbacks = []
+
+    def __getattr__(self, name):
+        fn = getattr(self.lib, name)
+        if not name.startswith("PiGentlSdk"):
+            return fn
+        stats = self.calls[name] = CallStats(name)
+        callbacks = self.callbacks
+        perf_counter_ns = time.perf_counter_ns
+
+        def call(*args):
+            start = perf_counter_ns()
+            err = fn(*args)
+            elapsed = perf_counter_ns() - start
+            stats.count += 1
+            stats.total_ns += elapsed
+            if elapsed > stats.max_ns:
+                stats.max_ns = elapsed
+            stats.histogram[min(elapsed.bit_length(), LATENCY_BUCKETS - 1)] += 1
+            if err:
+                stats.errors += 1
+            for callback in callbacks:
+                callback(name, err, start, elapsed)
+            return err
+
+        call.__name__ = name
+        # Later lookups find the wrapper directly
+        setattr(self, name, call)
+        return call
+
+    def report(self):
+        """Print the statistics of every called entry point, by decreasing total time."""
+        print("SDK calls:")
+        print(
+            "\t{:<32} {:>8} {:>7} {:>10} {:>10} {:>10} {:>10}".format(
+                "function", "calls", "errors", "total ms", "mean us", "p99 us", "max us"
+            )
+        )
+        for stats in sorted(self.calls.values(), key=lambda s: s.total_ns, reverse=True):
+            if stats.count:
+                print(
+                    "\t{:<32} {:>8} {:>7} {:>10.2f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+                        stats.name,
+                        stats.count,
+                        stats.errors,
+                        stats.total_ns * 1e-6,
+                        stats.mean_ns * 1e-3,
+                        stats.percentile_ns(99) * 1e-3,
+                        stats.max_ns * 1e-3,
+                    )
+                )
+
+
+class TraceEvents:
+    """Instrumentation callback collecting the SDK calls as Chrome trace events (chrome://tracing, Perfetto)."""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, name, err, start_ns, elapsed_ns):
+        self.events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start_ns / 1e3,
+                "dur": elapsed_ns / 1e3,
+                "pid": 0,
+                "tid": threading.get_ident(),
+                "args": {"err": err},
+            }
+        )
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events}, f)
@@ -0,0 +1,157 @@
+import math
+import time
+
+import numpy as np
+
+
+class LiveView:
+    """Live display decoupled from the acquisition. submit() only keeps a reference to the most recent frame; the
+    display renders it at a capped refresh rate, either from refresh() calls or from a GUI timer (start()), so that
+    intermediate frames are skipped and the preview never slows the acquisition down. Frames are decimated to the
+    display resolution and drawn with blitting; the color limits are fixed or taken from percentiles of a
+    subsample:
+        live = LiveView(max_fps=20)
+        for frame in grabber:
+            live.submit(frame)
+            live.refresh()"""
+
+    def __init__(self, max_fps=20, display_size=(600, 800), limits=None, percentiles=(0.5, 99.5),
+                 limits_every=10, cmap="gray", fignum=5):
+        """Constructor
+        :param max_fps: Maximum number of refreshes per second.
+        :param display_size: (rows, columns) the frames are decimated to.
+        :param limits: Fixed (min, max) color limits, None for percentile-based limits.
+        :param percentiles: Percentiles used as color limits when limits is None.
+        :param limits_every: Recompute the percentile-based limits every limits_every refreshes.
+        :param cmap: Colormap of mono images.
+        :param fignum: Number of the matplotlib figure, by default one not used by the plotting helpers (1 to 4)."""
+        self.period = 1.0 / max_fps
+        self.display_size = display_size
+        self.limits = limits
+        self.percentiles = percentiles
+        self.limits_every = limits_every
+        self.cmap = cmap
+        self.fignum = fignum
+        self.frames_submitted = 0
+        self.frames_shown = 0
+        self._latest = None
+        self._label = None
+        self._shown = None
+        self._last_refresh = 0.0
+        self._artist = None
+        self._text = None
+        self._background = None
+        self._timer = None
+        self._canvas = None
+        self._draw_cid = None
+
+    @property
+    def stats(self):
+        return {
+            "frames_submitted": self.frames_submitted,
+            "frames_shown": self.frames_shown,
+            "frames_skipped": self.frames_submitted - self.frames_shown,
+        }
+
+    def submit(self, image, label=None):
+        """Offer a frame (or a Frame) to the display. Cheap: the frame is only referenced.
+        NOTE: The image must stay valid until the next submit, do not submit a leased frame which gets released."""
+        self._latest = getattr(image, "image", image)
+        self._label = label if label is not None else self.frames_submitted + 1
+        self.frames_submitted += 1
+
+    def refresh(self, force=False):
+        """Render the most recent frame if a new one was submitted and the refresh period elapsed.
+        returns True if the display was updated"""
+        now = time.perf_counter()
+        image = self._latest
+        if image is None or image is self._shown or (not force and now - self._last_refresh < self.period):
+            return False
+        self._last_refresh = now
+        self._shown = image
+        self._render(image, self._label)
+        self.frames_shown += 1
+        return True
+
+    def start(self):
+        """Refresh from a timer of the GUI event loop (runs while the loop runs, e.g. plt.pause or plt.show)."""
+        if self._timer is None:
+            import matplotlib.pyplot as plt
+
+            fig = plt.figure(self.fignum)
+            self._timer = fig.canvas.new_timer(interval=max(int(self.period * 1000), 1))
+            self._timer.add_callback(self.refresh)
+        self._timer.start()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+
+    def close(self):
+        """Stop the timer and detach from the figure."""
+        self.stop()
+        self._disconnect()
+        self._artist = None
+
+    def _decimate(self, image):
+        step = max(math.ceil(image.shape[0] / self.display_size[0]), math.ceil(image.shape[1] / self.display_size[1]))
+        return image[::step, ::step] if step > 1 else image
+
+    def _clim(self, small):
+        if self.limits is not None:
+            return self.limits
+        sample = small[::4, ::4] if small.size > 65536 else small
+        lo, hi = np.percentile(sample, self.percentiles)
+        return lo, max(hi, lo + 1)
+
+    def _setup(self, small):
+        import matplotlib.pyplot as plt
+
+        plt.ion()
+        fig = plt.figure(self.fignum)
+        fig.clf()
+        ax = fig.add_subplot(111)
+        if small.ndim == 2:
+            lo, hi = self._clim(small)
+            self._artist = ax.imshow(small, origin="upper", cmap=self.cmap, vmin=lo, vmax=hi, animated=True)
+        else:
+            self._artist = ax.imshow(small, origin="upper", animated=True)
+        self._text = ax.text(0.01, 0.99, "", transform=ax.transAxes, va="top", color="yellow", animated=True)
+        self._disconnect()
+        self._canvas = fig.canvas
+        self._draw_cid = fig.canvas.mpl_connect("draw_event", self._on_draw)
+        fig.canvas.draw()
+        plt.show(block=False)
+
+    def _disconnect(self):
+        if self._draw_cid is not None:
+            self._canvas.mpl_disconnect(self._draw_cid)
+            self._canvas = None
+            self._draw_cid = None
+
+    def _on_draw(self, event):
+        # The figure was (re)drawn, e.g. resized: grab the new background
+        if self._artist is None or self._artist.figure is None:  # the figure was cleared by someone else
+            return
+        canvas = self._artist.figure.canvas
+        self._background = canvas.copy_from_bbox(self._artist.axes.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        ax = self._artist.axes
+        ax.draw_artist(self._artist)
+        ax.draw_artist(self._text)
+
+    def _render(self, image, label):
+        small = self._decimate(image)
+        if self._artist is None or self._artist.figure is None or self._artist.get_array().shape != small.shape:
+            self._setup(small)
+        self._artist.set_data(small)
+        if small.ndim == 2 and self.limits is None and self.frames_shown % self.limits_every == 0:
+            self._artist.set_clim(*self._clim(small))
+        self._text.set_text("#" + str(label))
+        canvas = self._artist.figure.canvas
+        canvas.restore_region(self._background)
+        self._draw_artists()
+        canvas.blit(self._artist.axes.bbox)
+        canvas.flush_events()
@@ -0,0 +1,173 @@
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from evaluationkit import frame_info_dtype
+from utils import xml_pixel_format_nptypes
+
+# State of a worker process, set by _init_worker
+_worker = {}
+
+
+def frame_layout(camera):
+    """Shape and dtype of the images delivered by get_image for the current sensor_width, sensor_height and
+    pixel_format of the camera.
+    returns (shape, dtype)"""
+    pixel_format = camera.pixel_format
+    if pixel_format == "RGB24":
+        shape = (camera.sensor_height, camera.sensor_width * 3)
+    else:
+        shape = (camera.sensor_height, camera.sensor_width)
+    return shape, np.dtype(xml_pixel_format_nptypes[pixel_format])
+
+
+class SharedFrameRing:
+    """Ring of frame slots in one multiprocessing.shared_memory block, attachable by name from other processes."""
+
+    def __init__(self, slots, shape, dtype, name=None):
+        """Constructor
+        :param slots: Number of frame slots.
+        :param shape: Shape of a frame.
+        :param dtype: Pixel type.
+        :param name: Name of an existing block to attach to, None to create (and own) a new one."""
+        self.shape = (slots,) + tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.frames = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, slot):
+        return self.frames[slot]
+
+    def close(self):
+        """Detach from the block, and free it when owned."""
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _init_worker(name, shape, dtype, analyze):
+    ring = SharedFrameRing(shape[0], shape[1:], dtype, name=name)
+    ring.frames.flags.writeable = False
+    _worker["ring"] = ring
+    _worker["analyze"] = analyze
+
+
+def _analyze_slot(slot, info):
+    return _worker["analyze"](_worker["ring"][slot], info)
+
+
+class AnalysisPipeline:
+    """Fans frames out to a pool of worker processes, so that GIL-bound analysis scales with the number of cores.
+    Each SDK buffer is copied once into a free slot of a SharedFrameRing; the workers only receive the slot index and
+    the buffer information, the pixels are never pickled. Results come back in acquisition order:
+        def analyze(image, info):  # module-level, the workers import it
+            return image.mean(axis=0)
+
+        with AnalysisPipeline(camera, analyze, workers=4) as pipeline:
+            camera.start_acquisition()
+            for profile in pipeline.run(1000):
+                ...
+            camera.stop_acquisition()
+    NOTE: The analyze function must not keep a reference to the image, its slot is reused once the result is
+          returned."""
+
+    def __init__(self, camera, analyze, workers=None, slots=None, context=None):
+        """Constructor
+        :param camera: The EvaluationKit (or OnyxMax) to acquire from, its pixel format and size define the slots.
+        :param analyze: Picklable function analyze(image, info) run by the workers. image is a read-only view onto
+                        the slot, info a dict of the frame_info_dtype fields.
+        :param workers: Number of worker processes, by default the number of cores.
+        :param slots: Number of frame slots, by default 2 per worker so that acquisition overlaps analysis.
+        :param context: Optional multiprocessing context, e.g. multiprocessing.get_context("spawn")."""
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if slots is None:
+            slots = 2 * workers
+        self.camera = camera
+        shape, dtype = frame_layout(camera)
+        self.ring = SharedFrameRing(slots, shape, dtype)
+        self.info = np.zeros(slots, dtype=frame_info_dtype)
+        context = multiprocessing if context is None else context
+        self.pool = context.Pool(
+            workers, initializer=_init_worker, initargs=(self.ring.name, self.ring.shape, self.ring.dtype, analyze)
+        )
+        self._free = collections.deque(range(slots))
+        self._pending = collections.deque()
+        self.frames_submitted = 0
+
+    def submit(self, timeout=5000):
+        """Copy the next frame into a free slot and hand it to the workers.
+        NOTE: Blocks on the oldest pending result when all slots are in use, which is then kept for results().
+        returns error code"""
+        while not self._free:
+            next(result for _, result, done in self._pending if not done).wait()
+            self._collect()
+        slot = self._free.popleft()
+        try:
+            err = self.camera.get_image_into(self.ring[slot], timeout, self.info[slot : slot + 1])
+        except Exception:
+            self._free.appendleft(slot)
+            raise
+        info = dict(zip(frame_info_dtype.names, self.info[slot].item()))
+        self._pending.append((slot, self.pool.apply_async(_analyze_slot, (slot, info)), []))
+        self.frames_submitted += 1
+        return err
+
+    def _collect(self):
+        """Free the slots of the finished results at the head of the queue, keeping their results."""
+        for slot, result, done in self._pending:
+            if done:
+                continue
+            if not result.ready():
+                break
+            done.append(result.get())
+            self._free.append(slot)
+
+    def results(self, block=True):
+        """Results of the submitted frames, in submission order.
+        :param block: Wait for the pending results, otherwise stop at the first unfinished one.
+        returns a generator of results"""
+        while self._pending:
+            slot, result, done = self._pending[0]
+            if not done:
+                if not block and not result.ready():
+                    return
+                done.append(result.get())
+                self._free.append(slot)
+            self._pending.popleft()
+            yield done[0]
+
+    def run(self, n, timeout=5000):
+        """Acquire n frames and analyze them. The acquisition must be started.
+        :param n: Number of frames.
+        :param timeout: Timeout in ms for each frame.
+        returns a generator of the n results, in acquisition order"""
+        for _ in range(n):
+            self.submit(timeout)
+            yield from self.results(block=False)
+        yield from self.results()
+
+    def close(self):
+        """Stop the workers and free the shared memory. Results not yet retrieved are lost."""
+        self.pool.close()
+        self.pool.join()
+        self._pending.clear()
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,86 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+from histogram import HistogramEngine
+from utils import xml_pixel_format_cmap, xml_pixel_format_nptypes
+
+
+def init_figure(ek):
+    plt.ion()
+    fig = plt.figure(1)
+    fig.clf()
+    ax = fig.add_subplot(111)
+    shape = (ek.sensor_height, ek.sensor_width)
+    image = np.zeros(shape, dtype=xml_pixel_format_nptypes[ek.pixel_format])
+    fig_handle = ax.imshow(image, origin="upper", cmap=xml_pixel_format_cmap[ek.pixel_format])
+    fig_handle.autoscale()
+    return fig_handle
+
+
+def update_figure(fig_handle, image, INTERVAL_PLOT, nim):
+    fig_handle.set_data(image)
+    fig_handle.autoscale()
+    plt.title("#" + str(nim))
+    plt.pause(INTERVAL_PLOT)
+    plt.draw()
+
+
+def imagesc(im, autoscale=True):
+    # Image show
+    fig = plt.figure(1)
+    aux = im.copy()
+    fig.clf()
+    plt.imshow(aux, cmap="gray")
+    plt.autoscale(enable=autoscale)
+    plt.colorbar()
+    plt.xlabel("#cols")
+    plt.ylabel("#rows")
+    plt.title("Lince11M image")
+
+
+def imageProfile(im, stats=None):
+    # H-V profiles, taken from stats (FrameStats of im) when given
+    fig = plt.figure(2)
+    if stats is None:
+        col_profile, row_profile = np.mean(im, axis=0), np.mean(im, axis=1)
+    else:
+        col_profile, row_profile = stats.col_profile, stats.row_profile
+    fig.clf()
+    plt.subplot(211)
+    plt.plot(col_profile)
+    plt.grid()
+    plt.xlabel("#cols")
+    plt.ylabel("Signal level[LSB]")
+    plt.title("Vertical profile")
+    plt.subplot(212)
+    plt.plot(row_profile)
+    plt.grid()
+    plt.xlabel("#rows")
+    plt.ylabel("Signal level[LSB]")
+    plt.title("Horizontal profile")
+
+
+def imageHist(im, bits=None):
+    # Histogram, one bin per code, computed once for both plots
+    if bits is None:
+        bits = max(int(im.max()).bit_length(), 8)
+    hist = HistogramEngine(bits)
+    hist.update(im)
+
+    fig = plt.figure(3)
+    fig.clf()
+    hist.plot(fig.add_subplot(111))
+    plt.grid()
+    plt.ylabel("Number of pixels")
+    plt.xlabel("Signal level[LSB]")
+    plt.title("Histogram")
+
+    # Accumulated Histogram
+    fig = plt.figure(4)
+    fig.clf()
+    hist.plot(fig.add_subplot(111), log=True)
+    plt.grid()
+    plt.ylabel("Number of pixels")
+    plt.xlabel("Signal level[LSB]")
+    plt.title("Accumulated histogram")
+    return hist
@@ -0,0 +1,152 @@
+import queue
+import time
+from evaluationkit import CAM_ERR_SUCCESS, load_library, enumerate_cameras, find_camera
+from sensor import OnyxMax, default_library_paths
+
+
+class CameraPool:
+    """Several evaluation kits sharing one pigentl library.
+    The cameras are enumerated once; each opened camera grabs on its own FrameGrabber thread (the SDK calls release
+    the GIL), so the aggregate throughput scales with the number of devices:
+        with CameraPool() as pool:
+            pool.open_all()
+            pool.start()
+            for serial, frame in pool.frames():
+                process(serial, frame.image)
+    """
+
+    def __init__(self, dll_path=None, cti_path=None, camera_class=OnyxMax):
+        """Constructor
+        :param dll_path: Optionally specify the absolute path to the pigentl DLL.
+        :param cti_path: Optionally specify the absolute path to the pigentl CTI.
+        :param camera_class: Class of the opened cameras, an EvaluationKit accepting camera and lib arguments."""
+        dll_path, cti_path = default_library_paths(dll_path, cti_path)
+        self.lib = load_library(dll_path, cti_path)
+        self.camera_class = camera_class
+        self.camera_infos = enumerate_cameras(self.lib)
+        print(str(len(self.camera_infos)) + " camera(s) found")
+        # Opened cameras by serial number
+        self.cameras = {}
+        self._start_ns = None
+        self._stop_ns = None
+
+    @property
+    def serials(self):
+        """Serial numbers of the enumerated cameras."""
+        return [camera_info.serial.decode() for camera_info in self.camera_infos]
+
+    def __len__(self):
+        return len(self.cameras)
+
+    def __getitem__(self, serial):
+        return self.cameras[serial]
+
+    def __iter__(self):
+        return iter(self.cameras.values())
+
+    def open(self, camera):
+        """Open an enumerated camera, once.
+        :param camera: Index or serial number of the camera.
+        returns the camera"""
+        camera_info = find_camera(self.camera_infos, camera)
+        serial = camera_info.serial.decode()
+        if serial not in self.cameras:
+            self.cameras[serial] = self.camera_class(camera=camera_info, lib=self.lib)
+        return self.cameras[serial]
+
+    def open_all(self):
+        """Open every enumerated camera.
+        returns list of cameras"""
+        return [self.open(index) for index in range(len(self.camera_infos))]
+
+    @property
+    def running(self):
+        return any(camera.grabber is not None and camera.grabber.running for camera in self)
+
+    def start(self, queue_size=16, policy="block", timeout=1000):
+        """Start the acquisition and the grabber thread of every opened camera, see EvaluationKit.start_grabber."""
+        for camera in self:
+            camera.start_grabber(queue_size=queue_size, policy=policy, timeout=timeout)
+        self._start_ns = time.perf_counter_ns()
+        self._stop_ns = None
+
+    def stop(self):
+        """Stop the grabber threads and the acquisitions. Frames still queued remain available from frames().
+        returns the first error code, CAM_ERR_SUCCESS when all cameras stopped"""
+        errors = [camera.stop_grabber() for camera in self]
+        self._stop_ns = time.perf_counter_ns()
+        return next((err for err in errors if err != CAM_ERR_SUCCESS), CAM_ERR_SUCCESS)
+
+    def frames(self, max_skew=0.1):
+        """Merge the frames of all cameras in host timestamp order (see Frame.host_timestamp).
+        A frame is delivered once every other running camera has delivered a later one, or after waiting max_skew,
+        so that a stalled camera does not block the others.
+        :param max_skew: Maximum time in s a frame waits for the other cameras.
+        returns a generator of (serial, Frame), ending when the grabbers are stopped and drained"""
+        heads = {}
+        max_skew_ns = int(max_skew * 1e9)
+        while True:
+            waiting = []
+            for serial, camera in self.cameras.items():
+                if serial in heads or camera.grabber is None:
+                    continue
+                try:
+                    heads[serial] = camera.grabber.frames.get_nowait()
+                except queue.Empty:
+                    if camera.grabber.running:
+                        waiting.append((serial, camera.grabber))
+            if heads:
+                serial = min(heads, key=lambda key: heads[key].host_timestamp)
+                age_ns = time.perf_counter_ns() - heads[serial].host_timestamp
+                if not waiting or age_ns >= max_skew_ns:
+                    yield serial, heads.pop(serial)
+                    continue
+                timeout = (max_skew_ns - age_ns) * 1e-9
+            elif not waiting:
+                return
+            else:
+                timeout = max_skew
+            # Wait for the first camera without a pending frame
+            serial, grabber = waiting[0]
+            try:
+                heads[serial] = grabber.get(timeout=timeout)
+            except queue.Empty:
+                pass
+
+    def stats(self):
+        """Grabber statistics and throughput of each camera since start:
+        fps - frames/s grabbed
+        bandwidth - MB/s grabbed
+        returns dict by serial number, plus the aggregate throughput under the "total" key"""
+        end_ns = self._stop_ns if self._stop_ns is not None else time.perf_counter_ns()
+        elapsed = (end_ns - self._start_ns) * 1e-9 if self._start_ns is not None else 0.0
+        stats = {}
+        for serial, camera in self.cameras.items():
+            if camera.grabber is None:
+                continue
+            grabber_stats = camera.grabber.stats
+            grabber_stats["fps"] = grabber_stats["frames_grabbed"] / elapsed if elapsed else 0.0
+            grabber_stats["bandwidth"] = grabber_stats["bytes_grabbed"] / elapsed * 1e-6 if elapsed else 0.0
+            stats[serial] = grabber_stats
+        stats["total"] = {
+            "fps": sum(camera_stats["fps"] for camera_stats in stats.values()),
+            "bandwidth": sum(camera_stats["bandwidth"] for camera_stats in stats.values()),
+        }
+        return stats
+
+    def close(self):
+        """Stop the acquisitions, close the cameras and terminate the shared library."""
+        if self.running:
+            self.stop()
+        for camera in self:
+            camera.close()
+        self.cameras = {}
+        if self.lib is not None:
+            self.lib.PiGentlSdkTerminateLibrary()
+            self.lib = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class TemporalAccumulator:
+    """Per-pixel temporal mean and variance of a stack of frames, folded in one frame at a time (Welford updates in
+    float64), so that memory stays O(pixels) whatever the number of frames."""
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.count = 0
+        self.mean = np.zeros(self.shape, dtype=np.float64)
+        self._m2 = np.zeros(self.shape, dtype=np.float64)
+        self._delta = np.empty(self.shape, dtype=np.float64)
+        self._delta2 = np.empty(self.shape, dtype=np.float64)
+
+    def reset(self):
+        self.count = 0
+        self.mean[...] = 0
+        self._m2[...] = 0
+
+    def add(self, image):
+        """Fold a frame (or a Frame) in."""
+        image = getattr(image, "image", image)
+        self.count += 1
+        # delta = x - mean ; mean += delta / n ; M2 += delta * (x - mean)
+        np.subtract(image, self.mean, out=self._delta)
+        self.mean += self._delta / self.count
+        np.subtract(image, self.mean, out=self._delta2)
+        self._delta2 *= self._delta
+        self._m2 += self._delta2
+
+    @property
+    def variance(self):
+        """Per-pixel temporal variance (unbiased)"""
+        if self.count < 2:
+            return np.zeros(self.shape, dtype=np.float64)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def temporal_noise(self):
+        """Spatial mean of the per-pixel temporal standard deviation"""
+        return float(np.sqrt(self.variance).mean())
+
+    def point(self):
+        """returns (spatial mean of the temporal mean, spatial mean of the temporal variance)"""
+        return float(self.mean.mean()), float(self.variance.mean())
+
+
+class PhotonTransferCurve:
+    """Photon transfer curve of an exposure sweep: for each step, the frames are folded into a TemporalAccumulator
+    and reduced to a (mean, variance) point when the next step starts.
+        ptc = PhotonTransferCurve((H, W))
+        for exposure in [10, 20, 30, 50, 100]:
+            camera.exposure_time = exposure
+            ptc.start_step(exposure)
+            for i in range(n):
+                ptc.add(camera.get_image()[1])
+        print(ptc.conversion_gain())"""
+
+    def __init__(self, shape, dark=None):
+        """Constructor
+        :param shape: Shape of the frames.
+        :param dark: Optional (mean, variance) of the dark signal subtracted from every point."""
+        self.accumulator = TemporalAccumulator(shape)
+        self.dark = dark
+        self.settings = []
+        self.means = []
+        self.variances = []
+        self._setting = None
+
+    def start_step(self, setting=None):
+        """Close the current step and start a new one.
+        :param setting: The parameter of the step (e.g. the exposure time)."""
+        self.end_step()
+        self._setting = setting
+
+    def add(self, image):
+        self.accumulator.add(image)
+
+    def end_step(self):
+        """Reduce the frames of the current step to a PTC point."""
+        if self.accumulator.count < 2:
+            self.accumulator.reset()
+            return
+        mean, variance = self.accumulator.point()
+        if self.dark is not None:
+            mean -= self.dark[0]
+            variance -= self.dark[1]
+        self.settings.append(self._setting)
+        self.means.append(mean)
+        self.variances.append(variance)
+        self.accumulator.reset()
+
+    @property
+    def points(self):
+        """returns list of (setting, mean, variance)"""
+        return list(zip(self.settings, self.means, self.variances))
+
+    def conversion_gain(self):
+        """Fit variance = mean / K + read noise^2 on the PTC points (shot-noise limited region).
+        returns (K in e-/LSB, read noise in LSB)"""
+        self.end_step()
+        if len(self.means) < 2:
+            raise Exception("At least 2 PTC points are needed to compute the conversion gain")
+        slope, intercept = np.polyfit(self.means, self.variances, 1)
+        return float(1.0 / slope), float(np.sqrt(max(intercept, 0.0)))
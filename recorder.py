@@ -0,0 +1,207 @@
+import os
+import queue
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from packing import PackedCodec
+
+
+class TiffEncoder:
+    """One TIFF file per frame (Pillow)."""
+
+    extension = ".tiff"
+
+    def __init__(self, compression=None):
+        """:param compression: Optional lossless TIFF compression supported by Pillow, e.g. "tiff_adobe_deflate"."""
+        self.compression = compression
+
+    def write(self, fileobj, image):
+        from PIL import Image
+
+        if self.compression is None:
+            Image.fromarray(image).save(fileobj, format="TIFF")
+        else:
+            Image.fromarray(image).save(fileobj, format="TIFF", compression=self.compression)
+
+
+class RawEncoder:
+    """The pixels as they are in memory, without header."""
+
+    extension = ".raw"
+
+    def write(self, fileobj, image):
+        fileobj.write(np.ascontiguousarray(image).data)
+
+
+class ZlibEncoder:
+    """The pixels as they are in memory, compressed with zlib (lossless)."""
+
+    extension = ".raw.zlib"
+
+    def __init__(self, level=1):
+        self.level = level
+
+    def write(self, fileobj, image):
+        fileobj.write(zlib.compress(np.ascontiguousarray(image).data, self.level))
+
+
+class PackedEncoder:
+    """10 or 12-bit pixels bit-packed, optionally compressed (lossless), see PackedCodec."""
+
+    def __init__(self, bits, entropy=None, delta=False, level=1):
+        self.codec = PackedCodec(bits, entropy=entropy, delta=delta, level=level)
+        self.extension = f".p{bits}" + ("." + entropy if entropy else "")
+
+    def write(self, fileobj, image):
+        fileobj.write(self.codec.encode(image))
+
+
+# used to select an encoder by name
+recorder_encoders = {
+    "tiff": TiffEncoder,
+    "tiff-deflate": lambda: TiffEncoder(compression="tiff_adobe_deflate"),
+    "raw": RawEncoder,
+    "zlib": ZlibEncoder,
+    "packed10": lambda: PackedEncoder(10),
+    "packed12": lambda: PackedEncoder(12),
+    "packed10-zlib": lambda: PackedEncoder(10, entropy="zlib"),
+    "packed12-zlib": lambda: PackedEncoder(12, entropy="zlib"),
+    "packed10-lzma": lambda: PackedEncoder(10, entropy="lzma"),
+    "packed12-lzma": lambda: PackedEncoder(12, entropy="lzma"),
+}
+
+
+class FrameRecorder:
+    """Saves frames on disk from a pool of writer threads fed by a bounded queue, so that disk I/O overlaps with
+    the acquisition. When the queue is full write() blocks (backpressure), see stats.
+        with FrameRecorder("capture", encoder="tiff") as recorder:
+            recorder.write(image, "EK-image_1")
+    NOTE: The images are written asynchronously, they must not be modified after write() unless copy=True."""
+
+    def __init__(self, directory=".", encoder="tiff", workers=2, queue_size=32, prefix="EK-image", copy=False):
+        """Constructor
+        :param directory: Directory of the files, created if it doesn't exist.
+        :param encoder: Name of one of recorder_encoders, or an encoder object (extension attribute and
+                        write(fileobj, image) method).
+        :param workers: Number of writer threads.
+        :param queue_size: Maximum number of frames waiting to be written.
+        :param prefix: Prefix of the file names when write() is not given a name.
+        :param copy: Copy the images in write()."""
+        self.directory = directory
+        self.encoder = recorder_encoders[encoder]() if isinstance(encoder, str) else encoder
+        self.prefix = prefix
+        self.copy = copy
+        self.frames_queued = 0
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.queue_high_water = 0
+        self.blocked_count = 0
+        self.blocked_time = 0.0
+        self.errors = []
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._unsynced = []
+        if not (os.path.exists(directory)):
+            os.makedirs(directory)
+        self._workers = [
+            threading.Thread(target=self._run, name=f"FrameRecorder-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def stats(self):
+        return {
+            "frames_queued": self.frames_queued,
+            "frames_written": self.frames_written,
+            "frames_pending": self._queue.qsize(),
+            "bytes_written": self.bytes_written,
+            "queue_high_water": self.queue_high_water,
+            "blocked_count": self.blocked_count,
+            "blocked_time": self.blocked_time,
+            "errors": len(self.errors),
+        }
+
+    def write(self, image, name=None):
+        """Queue an image (or a Frame) to be written as <directory>/<name><encoder extension>.
+        Blocks while the queue is full.
+        returns the path of the file"""
+        if self._workers is None:
+            raise Exception("FrameRecorder is closed")
+        image = getattr(image, "image", image)
+        if self.copy:
+            image = image.copy()
+        if name is None:
+            name = self.prefix + "_" + str(self.frames_queued + 1)
+        path = os.path.join(self.directory, name + self.encoder.extension)
+        if self._queue.full():
+            t0 = time.perf_counter()
+            self._queue.put((path, image))
+            self.blocked_count += 1
+            self.blocked_time += time.perf_counter() - t0
+        else:
+            self._queue.put((path, image))
+        self.frames_queued += 1
+        self.queue_high_water = max(self.queue_high_water, self._queue.qsize())
+        return path
+
+    def flush(self):
+        """Wait until every queued frame is written and synced to disk.
+        raises an Exception if frames could not be written"""
+        self._queue.join()
+        with self._lock:
+            paths, self._unsynced = self._unsynced, []
+        for path in paths:
+            with open(path, "r+b") as f:
+                os.fsync(f.fileno())
+        if paths and os.name == "posix":
+            # The directory entries of the new files, a directory cannot be opened (nor synced) on Windows
+            fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise Exception(f"FrameRecorder: {len(errors)} frame(s) could not be written: {errors[0]}")
+
+    def close(self):
+        """Flush and stop the writer threads."""
+        if self._workers is None:
+            return
+        try:
+            self.flush()
+        finally:
+            for _ in self._workers:
+                self._queue.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._workers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, image = item
+                with open(path, "wb") as f:
+                    self.encoder.write(f, image)
+                    size = f.tell()
+                with self._lock:
+                    self.frames_written += 1
+                    self.bytes_written += size
+                    self._unsynced.append(path)
+            except Exception as e:
+                self.errors.append(e)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,51 @@
+class RegisterCache:
+    """Shadow copy of camera registers keyed by address.
+    Reads of a known register are answered from the cache, writes update it. Static registers (identification,
+    geometry) survive invalidate(), volatile registers (status, measurements) are never cached."""
+
+    def __init__(self, static_addresses=(), volatile_addresses=()):
+        """Constructor
+        :param static_addresses: Addresses whose value never changes while the camera is opened.
+        :param volatile_addresses: Addresses which must always be read from the camera."""
+        self.static_addresses = frozenset(static_addresses)
+        self.volatile_addresses = frozenset(volatile_addresses)
+        self._registers = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._registers)
+
+    def __contains__(self, address):
+        return address in self._registers
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._registers)}
+
+    def lookup(self, address, size):
+        """returns the cached bytes of the register or None when it has to be read from the camera"""
+        if address in self.volatile_addresses:
+            return None
+        data = self._registers.get(address)
+        if data is None or len(data) < size:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data[:size]
+
+    def store(self, address, data):
+        """Record the bytes read from or written to a register."""
+        if address not in self.volatile_addresses:
+            self._registers[address] = bytes(data)
+
+    def discard(self, address):
+        self._registers.pop(address, None)
+
+    def invalidate(self):
+        """Forget every register but the static ones."""
+        self._registers = {a: d for a, d in self._registers.items() if a in self.static_addresses}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
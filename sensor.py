@@ -72,6 +72,24 @@ xml_load_config_type = {
     "User7": 15,
 }
 
+# EK features which never change while the camera is opened (see enable_register_cache)
+_static_nodes = ("DeviceVendorName", "DeviceModelName", "DeviceVersion", "DeviceFirmwareVersion", "SerialNumber",
+                 "SensorWidth", "SensorHeight")
+
+# Sensor registers which must always be read from the sensor (see enable_register_cache)
+_volatile_sensor_registers = (
+    0x0052,  # reg_thermo - temperature measurement
+)
+
+# Sensor registers which cannot be written (see apply_sensor_registers)
+_read_only_sensor_registers = (
+    0x0052,  # reg_thermo - temperature measurement
+    0x007F,  # ChipID
+)
+
+# Number of registers of the sensor bank (0x00-0x7F)
+SENSOR_BANK_SIZE = 0x80
+
 onyx_analog_gain = {
     "x0.5": 0x0000,
     "x1": 0x0040,
@@ -83,6 +101,155 @@ onyx_analog_gain = {
     "x8": 0x01C0,
 }
 
+def _contiguous_runs(addresses, max_length):
+    """Split a sorted list of addresses into runs of consecutive addresses.
+    returns list of (first address, number of addresses)"""
+    runs = []
+    for addr in addresses:
+        if runs and addr == runs[-1][0] + runs[-1][1] and runs[-1][1] < max_length:
+            runs[-1][1] += 1
+        else:
+            runs.append([addr, 1])
+    return [tuple(run) for run in runs]
+
+
+def default_library_paths(dll_path=None, cti_path=None):
+    """Paths of the pigentl DLL and CTI, defaulting to the pigentl installation directory.
+    returns (dll_path, cti_path)"""
+    if dll_path is None:
+        dll_path = os.path.join(os.path.dirname(__file__), DEFAULT_PIGENTL_DIR, DEFAULT_DLL_NAME)
+    if cti_path is None:
+        cti_path = os.path.join(os.path.dirname(__file__), DEFAULT_PIGENTL_DIR, DEFAULT_CTI_NAME)
+    return dll_path, cti_path
+
+
+class SensorTransaction:
+    """Sensor register writes and masked read-modify-writes queued and applied at once by commit().
+    - every register needed by a read-modify-write is read once
+    - consecutive registers share a transfer when OnyxMax.sensor_burst_size allows it (single registers by default)
+    - a single settle delay (or none) follows the last write
+    - an optional verify pass reads back every written register
+    Used as a context manager the transaction is committed on exit:
+        with camera.transaction(settle=0.01) as t:
+            t.write(0x45, 0x03C3)
+            t.modify(0x03, value=0x0020, mask=0xFFDF)"""
+
+    def __init__(self, sensor, settle=0.0, verify=False):
+        """Constructor
+        :param sensor: The OnyxMax to configure.
+        :param settle: Delay in s after the last write, 0 for none.
+        :param verify: Read back the written registers and raise an exception on mismatch."""
+        self.sensor = sensor
+        self.settle = settle
+        self.verify = verify
+        self.error = CAM_ERR_SUCCESS
+        self._ops = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def write(self, address, value):
+        """Queue the write of value to the sensor register at address."""
+        self._ops.append((address, None, int(value) & 0xFFFF))
+
+    def modify(self, address, value, mask):
+        """Queue a read-modify-write: register = (register & mask) + value."""
+        self._ops.append((address, mask, int(value) & 0xFFFF))
+
+    def commit(self):
+        """Apply the queued operations.
+        returns error code"""
+        ops, self._ops = self._ops, []
+        burst = self.sensor.sensor_burst_size
+
+        # Read once every register modified before being written
+        known = set()
+        reads = set()
+        for addr, mask, _ in ops:
+            if mask is not None and addr not in known:
+                reads.add(addr)
+            known.add(addr)
+        shadow = {}
+        for start, n in _contiguous_runs(sorted(reads), burst):
+            shadow.update(zip(range(start, start + n), self.sensor.read_sensor_block(start, n).tolist()))
+
+        # Resolve the values to write, then group consecutive addresses
+        writes = []
+        for addr, mask, value in ops:
+            if mask is not None:
+                value = ((shadow[addr] & mask) + value) & 0xFFFF
+            shadow[addr] = value
+            if writes and addr == writes[-1][0] + len(writes[-1][1]) and len(writes[-1][1]) < burst:
+                writes[-1][1].append(value)
+            else:
+                writes.append((addr, [value]))
+        err = CAM_ERR_SUCCESS
+        for addr, values in writes:
+            error = self.sensor.write_sensor_block(addr, values)
+            if err == CAM_ERR_SUCCESS:
+                err = error
+        if self.settle > 0 and writes:
+            sleep(self.settle)
+
+        if self.verify:
+            written = {addr + i: v for addr, values in writes for i, v in enumerate(values)}
+            for start, n in _contiguous_runs(sorted(written), burst):
+                values = self.sensor.read_sensor_block(start, n, cached=False)
+                for addr, rval in zip(range(start, start + n), values.tolist()):
+                    if rval != shadow[addr]:
+                        raise Exception(
+                            "Sensor register 0x{:02x} verify failed: wrote 0x{:04x}, read 0x{:04x}".format(
+                                addr, shadow[addr], rval
+                            )
+                        )
+        self.error = err
+        return err
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+
+class SensorRegisterSnapshot:
+    """Image of consecutive sensor registers backed by a uint16 array, see OnyxMax.snapshot_sensor_registers."""
+
+    def __init__(self, values, address=0):
+        self.address = address
+        self.values = np.array(values, dtype=np.uint16)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, address):
+        return int(self.values[address - self.address])
+
+    def __eq__(self, other):
+        return self.address == other.address and np.array_equal(self.values, other.values)
+
+    @property
+    def addresses(self):
+        return np.arange(self.address, self.address + len(self.values))
+
+    def diff(self, other):
+        """Compare with another snapshot of the same registers.
+        returns list of (address, value in self, value in other)"""
+        if self.address != other.address or len(self) != len(other):
+            raise ValueError("Snapshots do not cover the same registers")
+        changed = np.flatnonzero(self.values != other.values)
+        return [(self.address + int(i), int(self.values[i]), int(other.values[i])) for i in changed]
+
+    def save(self, path):
+        np.savez(path, address=self.address, values=self.values)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return SensorRegisterSnapshot(data["values"], address=int(data["address"]))
+
+
 def print_info(ek):
     print("Camera INFO:")
     print("\tManufacturer info          ", ek.vendor_name)
@@ -98,19 +265,38 @@ def print_info(ek):
     print("\tImage Offset               ", ek.image_offset)
 
 class OnyxMax(EvaluationKit):
-    def __init__(self, dll_path=None, cti_path=None):
+    def __init__(self, dll_path=None, cti_path=None, camera=0, lib=None):
         self.DEFAULT_PIGENTL_DIR = DEFAULT_PIGENTL_DIR
         self.DEFAULT_CTI_NAME = DEFAULT_CTI_NAME
         self.DEFAULT_DLL_NAME = DEFAULT_DLL_NAME
-        if dll_path is None:
-            dll_path = os.path.join(os.path.dirname(__file__), self.DEFAULT_PIGENTL_DIR, self.DEFAULT_DLL_NAME)
-        if cti_path is None:
-            cti_path = os.path.join(os.path.dirname(__file__), self.DEFAULT_PIGENTL_DIR, self.DEFAULT_CTI_NAME)
-        super().__init__(dll_path, cti_path)
+        self._buffer_policy = None
+        if lib is None:
+            dll_path, cti_path = default_library_paths(dll_path, cti_path)
+        super().__init__(dll_path, cti_path, camera=camera, lib=lib)
+        # Replace the fixed NBUFFER by a count derived from the frame size, re-applied by load_config
+        self.configure_buffers()
 
     def __del__(self):
         super().__del__()
 
+    # Maximum number of consecutive 16-bit sensor registers moved by one register transfer. The default of 1 is the
+    # single register access of read_sensor_reg/write_sensor_reg. Multi-register transfers of 2*n bytes at
+    # BaseAddress+addr are unverified: the sensor registers are one address apart although 16-bit wide, so only raise
+    # it once the bridge is known (tested on hardware) to map such a transfer onto consecutive registers.
+    sensor_burst_size = 1
+
+    def enable_register_cache(self, static_addresses=None, volatile_addresses=None):
+        """This function enables a shadow copy of the camera registers.
+        Identification and geometry nodes are read once, measurement registers (temperature) are never cached. The
+        cache is updated by every write and invalidated by load_config and load_sensor_config.
+        returns the RegisterCache, see its hits/misses counters"""
+        if static_addresses is None:
+            static_addresses = [_xml_bootstrap_nodes_addresses[node] for node in _static_nodes]
+        if volatile_addresses is None:
+            base = _xml_sensor_nodes_addresses["BaseAddress"]
+            volatile_addresses = [base + addr for addr in _volatile_sensor_registers]
+        return super().enable_register_cache(static_addresses, volatile_addresses)
+
     @property
     def clkref(self):
         return 80  # MHz
@@ -140,6 +326,55 @@ class OnyxMax(EvaluationKit):
             )
         ]
 
+    @property
+    def pixel_size(self):  # in bits, as transferred
+        code = int.from_bytes(
+            self.read(address=_xml_bootstrap_nodes_addresses["PixelFormat"], size=4, decode=False)[1],
+            byteorder="little",
+        )
+        return (code >> 16) & 0xFF
+
+    @property
+    def frame_bytes(self):
+        return self.sensor_width * self.sensor_height * self.pixel_size // 8
+
+    @property
+    def max_frame_rate(self):
+        """Readout-limited frame rate in frames/s (sensor_height lines of line_length), an upper bound of the actual
+        frame rate. None when the line length is unknown."""
+        line_length = self.line_length
+        if line_length == 0:
+            return None
+        return 1e6 / (self.sensor_height * line_length / self.clkref)
+
+    def configure_buffers(
+        self, memory_budget=DEFAULT_BUFFER_MEMORY, latency_ms=DEFAULT_BUFFER_LATENCY, frame_rate=None
+    ):
+        """This function derives the number of SDK buffers from the frame size (sensor_width, sensor_height and
+        pixel_format), a memory budget and a latency tolerance. It is re-applied by load_config. The number of buffers
+        is kept when the frame size is unknown (pixel format "Unknown").
+        :param memory_budget: Maximum memory in bytes used by the buffers.
+        :param latency_ms: Time in ms of frames the buffers must hold when the host does not consume them, None to
+                           fill the memory budget.
+        :param frame_rate: Expected frame rate in frames/s, by default the one measured by the telemetry or else
+                           max_frame_rate.
+        returns the number of buffers"""
+        self._buffer_policy = (memory_budget, latency_ms, frame_rate)
+        if frame_rate is None and self.telemetry is not None:
+            frame_rate = self.telemetry.average_fps
+        if not frame_rate:
+            frame_rate = self.max_frame_rate
+        frame_bytes = self.frame_bytes
+        if frame_bytes == 0:  # Unknown pixel format
+            print("\tUnknown frame size, keeping {} buffers".format(self.number_of_buffers))
+            return self.number_of_buffers
+        count = buffer_count(frame_bytes, memory_budget, latency_ms, frame_rate)
+        err = self.set_number_of_buffers(count)
+        if err != CAM_ERR_SUCCESS:
+            raise Exception(f"PiGentlSdkSetNumberOfBuffers: {err}")
+        print("\t{} buffers of {:.2f} MB".format(count, frame_bytes / 1e6))
+        return count
+
     @property
     def sensor_width(self):
         return int.from_bytes(
@@ -204,10 +439,14 @@ class OnyxMax(EvaluationKit):
         )
 
     def load_config(self, value):  # in ms
-        return self.write(
+        error = self.write(
             address=_xml_bootstrap_nodes_addresses["LoadConfig"],
             data=xml_load_config_type[value],
         )
+        self.invalidate_register_cache()
+        if self._buffer_policy is not None:
+            self.configure_buffers(*self._buffer_policy)
+        return error
 
     def read_sensor_reg(self, address):
         addr=address+_xml_sensor_nodes_addresses["BaseAddress"]
@@ -222,6 +461,80 @@ class OnyxMax(EvaluationKit):
         error = self.write(address=addr, data=val)
         return error
 
+    def read_sensor_block(self, address, count, cached=True):
+        """This function reads count consecutive sensor registers starting at address.
+        Registers known by the register cache are not read again, the others are read with as few transfers as
+        sensor_burst_size allows.
+        :param cached: Set to False to read every register from the sensor.
+        returns numpy array of uint16"""
+        base = _xml_sensor_nodes_addresses["BaseAddress"]
+        cache = self.register_cache
+        values = np.zeros(count, dtype=np.uint16)
+        missing = []
+        for i in range(count):
+            raw = cache.lookup(base + address + i, 2) if cached and cache is not None else None
+            if raw is None:
+                missing.append(i)
+            else:
+                values[i] = int.from_bytes(raw, byteorder="little")
+        for start, n in _contiguous_runs(missing, self.sensor_burst_size):
+            err, raw = self._read_register(base + address + start, 2 * n)
+            if err != CAM_ERR_SUCCESS:
+                raise Exception(f"PiGentlSdkReadRegister: {err}")
+            values[start : start + n] = np.frombuffer(raw, dtype="<u2")
+            if cache is not None:
+                for k in range(n):
+                    cache.store(base + address + start + k, raw[2 * k : 2 * k + 2])
+        return values
+
+    def write_sensor_block(self, address, values):
+        """This function writes consecutive sensor registers starting at address, sensor_burst_size registers per
+        transfer.
+        returns error code"""
+        base = _xml_sensor_nodes_addresses["BaseAddress"]
+        values = np.asarray(values, dtype="<u2")
+        err = CAM_ERR_SUCCESS
+        for start in range(0, len(values), self.sensor_burst_size):
+            chunk = values[start : start + self.sensor_burst_size]
+            ba = bytearray(chunk.tobytes())
+            error = self._write_register(base + address + start, ba)
+            if self.register_cache is not None:
+                for k in range(len(chunk)):
+                    if error == CAM_ERR_SUCCESS:
+                        self.register_cache.store(base + address + start + k, ba[2 * k : 2 * k + 2])
+                    else:
+                        self.register_cache.discard(base + address + start + k)
+            if err == CAM_ERR_SUCCESS:
+                err = error
+        return err
+
+    def snapshot_sensor_registers(self, address=0, count=SENSOR_BANK_SIZE, cached=False):
+        """This function reads the sensor register bank, sensor_burst_size registers per transfer.
+        :param cached: Set to True to take registers known by the register cache from it.
+        returns SensorRegisterSnapshot"""
+        return SensorRegisterSnapshot(self.read_sensor_block(address, count, cached=cached), address=address)
+
+    def apply_sensor_registers(self, snapshot, settle=0.0, verify=False):
+        """This function restores a SensorRegisterSnapshot, writing only the registers which differ from the current
+        (cached) state. Read-only registers are skipped.
+        returns (error code, number of registers written)"""
+        current = self.read_sensor_block(snapshot.address, len(snapshot))
+        changed = np.flatnonzero(current != snapshot.values)
+        with self.transaction(settle=settle, verify=verify) as t:
+            for i in changed:
+                addr = snapshot.address + int(i)
+                if addr not in _read_only_sensor_registers:
+                    t.write(addr, snapshot.values[i])
+            written = len(t)
+        return t.error, written
+
+    def transaction(self, settle=0.0, verify=False):
+        """This function starts a batch of sensor register writes, see SensorTransaction.
+        :param settle: Delay in s after the last write, 0 for none.
+        :param verify: Read back the written registers.
+        returns SensorTransaction"""
+        return SensorTransaction(self, settle=settle, verify=verify)
+
     def write_vbs_dac(self, value):
         addr=_xml_bootstrap_nodes_addresses["VbsDac"]
         val = np.uint16(value)
@@ -239,56 +552,31 @@ class OnyxMax(EvaluationKit):
         error = self.write_sensor_reg(address=addr, value=wr)
         return error
 
-    def load_sensor_config(self, config):
-        for i in config:
-            addr=i[0]
-            val=i[1]
-            error = self.write_sensor_reg(address=addr, value=val)
-            print("WR 0x{:02x} = 0x{:04x}".format(addr, val))
-            sleep(0.1)
-        return error
+    def load_sensor_config(self, config, settle=0.1, verify=False):
+        with self.transaction(settle=settle, verify=verify) as t:
+            for i in config:
+                addr=i[0]
+                val=i[1]
+                t.write(addr, val)
+                print("WR 0x{:02x} = 0x{:04x}".format(addr, val))
+        self.invalidate_register_cache()
+        return t.error
 
     def enable_thermo(self):
-        # @0x03 - reg_dig_power - clk_thermo_en[5]=1
-        addr = 0x0003
-        value = 0x0020
-        mask = 0xFFDF
-        rd = self.read_sensor_reg(addr)
-        wr = (rd & mask) + value
-        error = self.write_sensor_reg(address=addr, value=wr)
-
-        #  @0x05 - reg_dig_config_2 - thermo_en[13]=1
-        addr = 0x0005
-        value = 0x2000
-        mask = 0xDFFF
-        rd = self.read_sensor_reg(addr)
-        wr = (rd & mask) + value
-        error = self.write_sensor_reg(address=addr, value=wr)
-
-        # @0x43 - reg_thermo_ctrl - thermo_selection[2:1] = 2 (counter start control)
-        addr = 0x0043
-        value = 0x0005
-        mask = 0xFFF8
-        rd = self.read_sensor_reg(addr)
-        wr = (rd & mask) + value
-        error = self.write_sensor_reg(address=addr, value=wr)
-
-        # @0x45
-        addr = 0x0045
-        value = 0x03C3
-        error = self.write_sensor_reg(address=addr, value=value)
-
-        # @0x46
-        addr = 0x0046
-        value = 0x0453
-        error = self.write_sensor_reg(address=addr, value=value)
-
-        # @0x4B
-        addr = 0x004B
-        value = 0x0453
-        error = self.write_sensor_reg(address=addr, value=value)
-
-        return error
+        with self.transaction() as t:
+            # @0x03 - reg_dig_power - clk_thermo_en[5]=1
+            t.modify(0x0003, value=0x0020, mask=0xFFDF)
+            #  @0x05 - reg_dig_config_2 - thermo_en[13]=1
+            t.modify(0x0005, value=0x2000, mask=0xDFFF)
+            # @0x43 - reg_thermo_ctrl - thermo_selection[2:1] = 2 (counter start control)
+            t.modify(0x0043, value=0x0005, mask=0xFFF8)
+            # @0x45
+            t.write(0x0045, 0x03C3)
+            # @0x46
+            t.write(0x0046, 0x0453)
+            # @0x4B
+            t.write(0x004B, 0x0453)
+        return t.error
 
     def read_thermo(self):
         addr = 0x0052
@@ -298,4 +586,4 @@ class OnyxMax(EvaluationKit):
         return value
 
     def close(self):
-        super().__del__()
+        super().close()
@@ -0,0 +1,203 @@
+import os
+
+import numpy as np
+
+SEQUENCE_MAGIC = b"EKSEQ"
+SEQUENCE_VERSION = 1
+# Frames start on a page boundary
+SEQUENCE_HEADER_SIZE = 4096
+# Maximum number of sensor registers stored in the header
+SEQUENCE_MAX_REGISTERS = 0x80
+
+# Fixed header of a sequence file
+sequence_header_dtype = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("header_size", "<u4"),
+        ("height", "<u4"),
+        ("width", "<u4"),
+        ("channels", "<u4"),  # 0 for 2D frames
+        ("dtype", "S8"),
+        ("pixel_format", "S16"),
+        ("register_address", "<u4"),
+        ("register_count", "<u4"),
+        ("registers", "<u2", (SEQUENCE_MAX_REGISTERS,)),
+    ]
+)
+
+# One record of the side index (<path>.idx) per frame, taken from tImageInfos
+sequence_index_dtype = np.dtype(
+    [
+        ("block_id", "<u8"),
+        ("timestamp", "<u8"),
+        ("exposure_time", "<f8"),  # in ms, NaN when unknown
+        ("is_incomplete", "u1"),
+    ]
+)
+
+
+def _index_path(path):
+    return path + ".idx"
+
+
+def _same_array(a, b):
+    """True when a and b are the same array, possibly through different view objects."""
+    return (
+        isinstance(a, np.ndarray)
+        and a.__array_interface__["data"][0] == b.__array_interface__["data"][0]
+        and a.shape == b.shape
+        and a.strides == b.strides
+        and a.dtype == b.dtype
+    )
+
+
+class SequenceWriter:
+    """Single-file raw sequence of frames: a fixed header (geometry, pixel format, sensor registers) followed by
+    the frames stored contiguously and appended through np.memmap. Per-frame information goes to a compact side
+    index (<path>.idx). Frames can be acquired straight into the file:
+        with SequenceWriter("capture.ekseq", (H, W), np.uint16, "Mono12p", camera.snapshot_sensor_registers()) as seq:
+            for i in range(n):
+                seq.append(camera.get_frame(), exposure_time=camera.exposure_time)"""
+
+    def __init__(self, path, shape, dtype, pixel_format="", registers=None, grow=64):
+        """Constructor
+        :param path: The sequence file, overwritten if it exists.
+        :param shape: Shape of a frame, (H, W) or (H, W, C).
+        :param dtype: Type of the pixels.
+        :param pixel_format: EK/XML pixel format name.
+        :param registers: Optional SensorRegisterSnapshot stored in the header.
+        :param grow: Number of frames the file is grown by when full."""
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.grow = grow
+        self.count = 0
+        self._capacity = 0
+        self._frames = None
+
+        header = np.zeros((), dtype=sequence_header_dtype)
+        header["magic"] = SEQUENCE_MAGIC
+        header["version"] = SEQUENCE_VERSION
+        header["header_size"] = SEQUENCE_HEADER_SIZE
+        header["height"] = self.shape[0]
+        header["width"] = self.shape[1]
+        header["channels"] = self.shape[2] if len(self.shape) > 2 else 0
+        header["dtype"] = self.dtype.str.encode()
+        header["pixel_format"] = pixel_format.encode()
+        if registers is not None:
+            values = np.asarray(registers.values, dtype=np.uint16)[:SEQUENCE_MAX_REGISTERS]
+            header["register_address"] = registers.address
+            header["register_count"] = len(values)
+            header["registers"][: len(values)] = values
+        with open(path, "wb") as f:
+            f.write(header.tobytes().ljust(SEQUENCE_HEADER_SIZE, b"\0"))
+        self._index = open(_index_path(path), "wb")
+        self._grow()
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        if self._frames is not None:
+            self._frames.flush()
+            self._frames = None
+        self._capacity += self.grow
+        with open(self.path, "r+b") as f:
+            f.truncate(SEQUENCE_HEADER_SIZE + self._capacity * self.frame_size)
+        self._frames = np.memmap(
+            self.path, dtype=self.dtype, mode="r+", offset=SEQUENCE_HEADER_SIZE, shape=(self._capacity,) + self.shape
+        )
+
+    def next_slot(self):
+        """returns the writable memory-mapped array of the next frame, e.g. for EvaluationKit.get_image_into.
+        Call append(slot, ...) once it is filled."""
+        if self.count == self._capacity:
+            self._grow()
+        return self._frames[self.count]
+
+    def append(self, image, block_id=0, timestamp=0, is_incomplete=False, exposure_time=np.nan):
+        """Append a frame.
+        :param image: The image, a Frame (its buffer information is used) or the array returned by next_slot().
+        :param exposure_time: Exposure time in ms the frame was acquired with.
+        returns the index of the frame"""
+        if hasattr(image, "block_id"):  # Frame
+            block_id, timestamp, is_incomplete = image.block_id, image.timestamp, image.is_incomplete
+            image = image.image
+        slot = self.next_slot()
+        # next_slot() returns a new view each call: compare the memory, the slot filled in place is not copied
+        if not _same_array(image, slot):
+            slot[...] = image
+        record = np.zeros((), dtype=sequence_index_dtype)
+        record["block_id"] = block_id
+        record["timestamp"] = timestamp
+        record["exposure_time"] = exposure_time
+        record["is_incomplete"] = is_incomplete
+        self._index.write(record.tobytes())
+        self.count += 1
+        return self.count - 1
+
+    def flush(self):
+        self._frames.flush()
+        self._index.flush()
+
+    def close(self):
+        """Flush and trim the file to the frames actually written."""
+        if self._frames is None:
+            return
+        self.flush()
+        self._frames = None
+        self._index.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(SEQUENCE_HEADER_SIZE + self.count * self.frame_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SequenceReader:
+    """Reads a sequence written by SequenceWriter. Frames are zero-copy read-only memory-mapped views:
+        seq = SequenceReader("capture.ekseq")
+        image = seq[50000]
+        block = seq[100:200]
+        seq.index["timestamp"]"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = np.frombuffer(f.read(sequence_header_dtype.itemsize), dtype=sequence_header_dtype)[0]
+        if header["magic"] != SEQUENCE_MAGIC:
+            raise Exception(f"{path} is not a sequence file")
+        if header["version"] > SEQUENCE_VERSION:
+            raise Exception(f"{path}: unsupported sequence version {header['version']}")
+        self.shape = (int(header["height"]), int(header["width"]))
+        if header["channels"]:
+            self.shape += (int(header["channels"]),)
+        self.dtype = np.dtype(header["dtype"].decode())
+        self.pixel_format = header["pixel_format"].decode()
+        self.register_address = int(header["register_address"])
+        self.registers = header["registers"][: header["register_count"]].copy()
+        header_size = int(header["header_size"])
+
+        self.index = np.fromfile(_index_path(path), dtype=sequence_index_dtype)
+        frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+        count = min(len(self.index), (os.path.getsize(path) - header_size) // frame_size)
+        self.index = self.index[:count]
+        if count:
+            self.frames = np.memmap(path, dtype=self.dtype, mode="r", offset=header_size, shape=(count,) + self.shape)
+        else:
+            self.frames = np.zeros((0,) + self.shape, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, item):
+        """returns a frame (or a range of frames) without reading the others"""
+        return self.frames[item]
+
+    def __iter__(self):
+        return iter(self.frames)
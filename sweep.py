@@ -0,0 +1,117 @@
+import time
+
+from evaluationkit import CAM_ERR_SUCCESS
+
+# Settings which cannot be changed while streaming: the acquisition is restarted around them
+SWEEP_RESTART_SETTINGS = ("load_config",)
+
+
+class ParameterSweep:
+    """Pipelined parameter sweep: the acquisition is started once, each step changes its settings while streaming,
+    discards the frames queued before the change and a number of settling frames instead of sleeping, and every
+    frame is tagged with the settings in effect. A step is a dict of settings:
+        "exposure_time": 10      - camera property, set with setattr
+        0x0C: 0x0100             - sensor register address, written with write_sensor_reg (one transaction per step)
+        "load_config": "GS-10b"  - method called with the value before the other settings, the acquisition is
+                                   restarted (see SWEEP_RESTART_SETTINGS)
+    Example:
+        sweep = ParameterSweep(camera, [{"exposure_time": t} for t in (10, 20, 30)], frames_per_step=10)
+        for frame in sweep.frames():
+            print(frame.settings, frame.image.mean())
+    NOTE: settle_frames only covers the frames exposed during the change, the frames already queued when the
+          settings are written (e.g. behind a slow consumer) are discarded whatever their number."""
+
+    def __init__(self, camera, steps, frames_per_step, settle_frames=2, timeout=5000, config_settle=0.5):
+        """Constructor
+        :param camera: The OnyxMax.
+        :param steps: List of dicts of settings.
+        :param frames_per_step: Number of frames kept for each step.
+        :param settle_frames: Number of frames discarded after each settings change.
+        :param timeout: Timeout in ms for each frame.
+        :param config_settle: Delay in s after load_config, before the other settings of the step are written."""
+        self.camera = camera
+        self.steps = [dict(step) for step in steps]
+        self.frames_per_step = frames_per_step
+        self.settle_frames = settle_frames
+        self.timeout = timeout
+        self.config_settle = config_settle
+        self.frames_discarded = 0
+
+    def __len__(self):
+        return len(self.steps)
+
+    def _apply(self, step, streaming):
+        restart = streaming and any(name in SWEEP_RESTART_SETTINGS for name in step)
+        if restart:
+            self.camera.stop_acquisition()
+        # The configuration is loaded first, it would overwrite the other settings
+        configs = [(name, value) for name, value in step.items() if name in SWEEP_RESTART_SETTINGS]
+        for name, value in configs:
+            getattr(self.camera, name)(value)
+        if configs and self.config_settle:
+            time.sleep(self.config_settle)
+        registers = {name: value for name, value in step.items() if isinstance(name, int)}
+        if registers:
+            with self.camera.transaction() as t:
+                for address, value in registers.items():
+                    t.write(address, value)
+        for name, value in step.items():
+            if not isinstance(name, int) and name not in SWEEP_RESTART_SETTINGS:
+                setattr(self.camera, name, value)
+        if restart:
+            self._start()
+        elif streaming:
+            # Frames delivered before the change were exposed with the previous settings
+            self.frames_discarded += self.camera.discard_queued_frames()
+
+    def _start(self):
+        err = self.camera.start_acquisition()
+        if err != CAM_ERR_SUCCESS:
+            raise Exception(f"PiGentlSdkStartAcquisition: {err}")
+
+    def _settle(self):
+        for _ in range(self.settle_frames):
+            self.camera.lease_image(self.timeout).release()
+            self.frames_discarded += 1
+
+    def _run(self, grab):
+        """Apply each step while streaming and call grab(step index, settings) to take its frames."""
+        self._apply(self.steps[0], streaming=False)
+        self._start()
+        try:
+            for index, step in enumerate(self.steps):
+                if index > 0:
+                    self._apply(step, streaming=True)
+                self._settle()
+                yield from grab(index, step)
+        finally:
+            self.camera.stop_acquisition()
+
+    def frames(self):
+        """Run the sweep.
+        returns a generator of Frame with settings (the dict of the step) and step (its index) attributes"""
+
+        def grab(index, step):
+            for _ in range(self.frames_per_step):
+                frame = self.camera.get_frame(self.timeout)
+                frame.settings = step
+                frame.step = index
+                yield frame
+
+        return self._run(grab)
+
+    def acquire(self, out, info=None):
+        """Run the sweep into an array.
+        :param out: Array of shape (len(steps), frames_per_step, H, W), e.g. preallocated or memory-mapped.
+        :param info: Optional array of frame_info_dtype of shape (len(steps), frames_per_step).
+        returns error code"""
+        errors = []
+
+        def grab(index, step):
+            step_info = None if info is None else info[index]
+            errors.append(self.camera.grab_burst(self.frames_per_step, out[index], self.timeout, step_info))
+            return iter(())
+
+        for _ in self._run(grab):
+            pass
+        return next((err for err in errors if err != CAM_ERR_SUCCESS), CAM_ERR_SUCCESS)
@@ -0,0 +1,129 @@
+import collections
+import json
+
+
+class FrameTelemetry:
+    """Frame-level telemetry of an acquisition, fed by every GetBuffer call of an EvaluationKit:
+    - lost frames (gaps in block IDs) and incomplete frames
+    - instantaneous (sliding window) and average frame rate and bandwidth
+    - host-side latency: time of receipt in Python minus device timestamp, relative to the smallest value seen
+      (the clocks are not synchronized, so the latency is the excess over the best observed transfer)
+    - time spent waiting in GetBuffer versus time spent by the user between two GetBuffer calls"""
+
+    def __init__(self, timestamp_frequency=1e9, window=32):
+        """Constructor
+        :param timestamp_frequency: Frequency in Hz of the device timestamp (iTimestamp).
+        :param window: Number of frames of the sliding window of the instantaneous rates."""
+        self.timestamp_frequency = timestamp_frequency
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.frames_lost = 0
+        self.frames_incomplete = 0
+        self.bytes = 0
+        self.getbuffer_ns = 0
+        self.processing_ns = 0
+        self.latency_ns = 0
+        self.latency_max_ns = 0
+        self._latency_sum_ns = 0
+        self._offset_min_ns = None
+        self._last_block_id = None
+        self._first_ns = None
+        self._first_size = 0
+        self._last_end_ns = None
+        self._recent = collections.deque(maxlen=self.window)
+
+    def record(self, image_infos, start_ns, end_ns):
+        """Account for a buffer returned by GetBuffer.
+        :param image_infos: The tImageInfos of the buffer.
+        :param start_ns: perf_counter_ns before GetBuffer.
+        :param end_ns: perf_counter_ns after GetBuffer."""
+        self.frames += 1
+        self.bytes += image_infos.iImageSize
+        if image_infos.isIncomplete:
+            self.frames_incomplete += 1
+        block_id = image_infos.iBlockId
+        if self._last_block_id is not None and block_id > self._last_block_id + 1:
+            self.frames_lost += block_id - self._last_block_id - 1
+        self._last_block_id = block_id
+
+        self.getbuffer_ns += end_ns - start_ns
+        if self._last_end_ns is not None:
+            self.processing_ns += start_ns - self._last_end_ns
+        else:
+            self._first_ns = end_ns
+            self._first_size = image_infos.iImageSize
+        self._last_end_ns = end_ns
+        self._recent.append((end_ns, image_infos.iImageSize))
+
+        offset = end_ns - int(image_infos.iTimestamp * 1e9 / self.timestamp_frequency)
+        if self._offset_min_ns is None or offset < self._offset_min_ns:
+            # A faster transfer than all the previous ones: rebase the latencies
+            if self._offset_min_ns is not None:
+                shift = self._offset_min_ns - offset
+                self._latency_sum_ns += shift * (self.frames - 1)
+                self.latency_max_ns += shift
+            self._offset_min_ns = offset
+        self.latency_ns = offset - self._offset_min_ns
+        self._latency_sum_ns += self.latency_ns
+        self.latency_max_ns = max(self.latency_max_ns, self.latency_ns)
+
+    @property
+    def fps(self):
+        """Frame rate over the sliding window"""
+        if len(self._recent) < 2:
+            return 0.0
+        return (len(self._recent) - 1) * 1e9 / max(self._recent[-1][0] - self._recent[0][0], 1)
+
+    @property
+    def average_fps(self):
+        if self.frames < 2:
+            return 0.0
+        return (self.frames - 1) * 1e9 / max(self._last_end_ns - self._first_ns, 1)
+
+    @property
+    def bandwidth(self):
+        """MB/s over the sliding window"""
+        if len(self._recent) < 2:
+            return 0.0
+        nbytes = sum(size for _, size in list(self._recent)[1:])
+        return nbytes * 1e3 / max(self._recent[-1][0] - self._recent[0][0], 1)
+
+    @property
+    def average_bandwidth(self):
+        """MB/s since the start"""
+        if self.frames < 2:
+            return 0.0
+        return (self.bytes - self._first_size) * 1e3 / max(self._last_end_ns - self._first_ns, 1)
+
+    @property
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "frames_lost": self.frames_lost,
+            "frames_incomplete": self.frames_incomplete,
+            "fps": self.fps,
+            "average_fps": self.average_fps,
+            "bandwidth_MBps": self.bandwidth,
+            "average_bandwidth_MBps": self.average_bandwidth,
+            "latency_ms": self.latency_ns * 1e-6,
+            "average_latency_ms": self._latency_sum_ns * 1e-6 / self.frames if self.frames else 0.0,
+            "max_latency_ms": self.latency_max_ns * 1e-6,
+            "getbuffer_s": self.getbuffer_ns * 1e-9,
+            "processing_s": self.processing_ns * 1e-9,
+        }
+
+    def dump(self, path=None):
+        """Print the statistics, or write them as JSON to path."""
+        stats = self.stats
+        if path is None:
+            print("Acquisition telemetry:")
+            for name, value in stats.items():
+                print("\t{:<24} {}".format(name, round(value, 3) if isinstance(value, float) else value))
+        else:
+            with open(path, "w") as f:
+                json.dump(stats, f, indent=2)
+        return stats
+
@@ -1,7 +1,18 @@
 import os
 import ctypes
 import numpy as np
-import matplotlib.pyplot as plt
+
+# Plotting helpers, moved to plotting so that the acquisition core does not import matplotlib. They are still
+# reachable as utils.<name>, matplotlib being imported on first use.
+_plotting_helpers = ("init_figure", "update_figure", "imagesc", "imageProfile", "imageHist")
+
+
+def __getattr__(name):
+    if name in _plotting_helpers:
+        import plotting
+
+        return getattr(plotting, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # used to convert from the EK/XML pixel format to colormap
@@ -33,136 +44,102 @@ xml_pixel_format_nptypes = {
 }
 
 
-def image_rearange(aux, pixel_format):
+def image_rearange(aux, pixel_format, planar=False, out=None):
+    """Rearrange an image as returned by get_image.
+    RGB24 is a (H x W*3) uint8 array R-G-B which is already (H x W x 3) in memory: it is returned as a view.
+    :param planar: Return RGB24 as (3 x H x W) planes instead of (H x W x 3).
+    :param out: Optional reusable output array, the image is copied into it.
+    returns the image, a view of aux unless out is given"""
     if pixel_format == "RGB24":  # RGB
-        # RGB24 is (5760 x 1080) uint8 array R-G-B
-        red = aux[:, 0::3].copy()
-        green = aux[:, 1::3].copy()
-        blue = aux[:, 2::3].copy()
-        image = np.stack((red, green, blue), axis=2)
+        image = aux.reshape(aux.shape[0], -1, 3)
+        if planar:
+            image = image.transpose(2, 0, 1)
     else:  # Mono
-        image = aux[:, :].copy()
+        image = aux
+    if out is not None:
+        np.copyto(out, image)
+        return out
     return image
 
 
-def image_rearange_subsampling22(aux, pixel_format):
+def image_rearange_subsampling22(aux, pixel_format, planar=False, out=None):
+    """Same as image_rearange keeping one column out of two.
+    returns the image, a view of aux unless out is given"""
     if pixel_format == "RGB24":  # RGB
-        # RGB24 is (2880 x 1080) uint8 array R-G-B
-        red = aux[:, 0::6].copy()
-        green = aux[:, 1::6].copy()
-        blue = aux[:, 2::6].copy()
-        image = np.stack((red, green, blue), axis=2)
+        image = aux.reshape(aux.shape[0], -1, 3)[:, 0::2, :]
+        if planar:
+            image = image.transpose(2, 0, 1)
     else:  # Mono
-        image = aux[:, 0::2].copy()
+        image = aux[:, 0::2]
+    if out is not None:
+        np.copyto(out, image)
+        return out
     return image
 
 
-def init_figure(ek):
-    plt.ion()
-    fig = plt.figure(1)
-    fig.clf()
-    ax = fig.add_subplot(111)
-    shape = (ek.sensor_height, ek.sensor_width)
-    image = np.zeros(shape, dtype=xml_pixel_format_nptypes[ek.pixel_format])
-    fig_handle = ax.imshow(np.flip(image, 0), origin="lower", cmap=xml_pixel_format_cmap[ek.pixel_format])
-    fig_handle.autoscale()
-    return fig_handle
-
-
-def update_figure(fig_handle, image, INTERVAL_PLOT, nim):
-    fig_handle.set_data(np.flip(image, 0))
-    fig_handle.autoscale()
-    plt.title("#" + str(nim))
-    plt.pause(INTERVAL_PLOT)
-    plt.draw()
+def image_binning22(aux, pixel_format, mode="sum", out=None):
+    """2x2 binning of an image as returned by get_image (an odd last row or column is dropped).
+    :param mode: "sum" or "mean" (rounded to the nearest integer for integer images).
+    :param out: Optional reusable output array. By default a sum is accumulated in a type wide enough for 4 pixels
+                and a mean keeps the type of the image.
+    returns the binned image, (H/2 x W/2) or (H/2 x W/2 x 3) for RGB24"""
+    image = image_rearange(aux, pixel_format)
+    h, w = image.shape[0] // 2, image.shape[1] // 2
+    blocks = image[: 2 * h, : 2 * w].reshape((h, 2, w, 2) + image.shape[2:])
+    if mode == "sum":
+        if out is None and image.dtype.kind == "u":
+            return blocks.sum(axis=(1, 3), dtype=np.uint16 if image.dtype.itemsize == 1 else np.uint32)
+        return blocks.sum(axis=(1, 3), out=out)
+    elif mode == "mean":
+        if image.dtype.kind not in "ui":
+            return blocks.mean(axis=(1, 3), out=out)
+        if out is None:
+            out = np.empty((h, w) + image.shape[2:], dtype=image.dtype)
+        acc = blocks.sum(axis=(1, 3), dtype=np.uint32 if image.dtype.kind == "u" else np.int32)
+        acc += 2
+        np.floor_divide(acc, 4, out=out, casting="unsafe")
+        return out
+    raise ValueError(f"Unknown binning mode {mode!r}, expected 'sum' or 'mean'")
+
+
+# set up access to Python 3 PyMemoryView_FromMemory() function
+PyBUF_READ = 0x100
+buf_from_mem = ctypes.pythonapi.PyMemoryView_FromMemory
+buf_from_mem.restype = ctypes.py_object
+buf_from_mem.argtypes = (ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_int)
+
+
+def make_nd_view(c_pointer, shape, dtype=np.uint16, order="C"):
+    """Wrap the memory at a given pointer into a read-only numpy array (no copy).
+    NOTE: The view is only valid as long as the underlying buffer is not released."""
+    arr_size = np.prod(shape[:]) * np.dtype(dtype).itemsize
+    buffer = buf_from_mem(c_pointer, arr_size, PyBUF_READ)
+    return np.ndarray(tuple(shape[:]), dtype, buffer, order=order)
 
 
 def make_nd_array(c_pointer, shape, dtype=np.uint16, order="C"):
     """Safely copy an array from a given pointer into a numpy array."""
-    # set up access to Python 3 PyMemoryView_FromMemory() function
-    PyBUF_READ = 0x200
-    buf_from_mem = ctypes.pythonapi.PyMemoryView_FromMemory
-    buf_from_mem.restype = ctypes.py_object
-    buf_from_mem.argtypes = (ctypes.c_void_p, ctypes.c_int, ctypes.c_int)
-    arr_size = np.prod(shape[:]) * np.dtype(dtype).itemsize
-    buffer = buf_from_mem(c_pointer, arr_size, PyBUF_READ)
-    arr = np.ndarray(tuple(shape[:]), dtype, buffer, order=order)
-    return arr.copy()
+    return make_nd_view(c_pointer, shape, dtype=dtype, order=order).copy()
 
 
 def imgWriteOpenCV(dirOut, imgs):
     import cv2 as cv
-    import os
 
     # Create directory if it doesn't exist
     if not (os.path.exists(dirOut)):
         os.mkdir(dirOut)
     # Save images in non-loss quality compresion and 16b
-    cv.imwrite(dirOut + "/im_" + str(i) + ".tiff", imgs[i, :, :].copy() << 4)
+    for i in range(imgs.shape[0]):
+        cv.imwrite(dirOut + "/im_" + str(i) + ".tiff", imgs[i, :, :] << 4)
 
     return 0
 
 
 def write_image(dirOut, imgs):
-    # Create directory if it doesn't exist
-    if not (os.path.exists(dirOut)):
-        os.mkdir(dirOut)
-    # Save images in non-loss quality compression and 16b
-    for i in range(imgs.shape[0]):
-        cv.imwrite(dirOut + "/im_" + str(i) + ".tiff", imgs[i, :, :].copy() << 4)
-    return 0
+    from recorder import FrameRecorder
 
-
-def imagesc(im, autoscale=True):
-    # Image show
-    fig = plt.figure(1)
-    aux = im.copy()
-    fig.clf()
-    plt.imshow(aux, cmap="gray")
-    plt.autoscale(enable=autoscale)
-    plt.colorbar()
-    plt.xlabel("#cols")
-    plt.ylabel("#rows")
-    plt.title("Lince11M image")
-
-
-def imageProfile(im):
-    # H-V profiles
-    fig = plt.figure(2)
-    aux = im.copy()
-    fig.clf()
-    plt.subplot(211)
-    plt.plot(np.mean(aux, axis=0))
-    plt.grid()
-    plt.xlabel("#cols")
-    plt.ylabel("Signal level[LSB]")
-    plt.title("Vertical profile")
-    plt.subplot(212)
-    plt.plot(np.mean(aux, axis=1))
-    plt.grid()
-    plt.xlabel("#rows")
-    plt.ylabel("Signal level[LSB]")
-    plt.title("Horizontal profile")
-
-
-def imageHist(im):
-    # Histogram
-    fig = plt.figure(3)
-    aux = im.copy()
-    fig.clf()
-    plt.hist(aux.ravel(), bins=1024, fc="k", ec="k")
-    plt.grid()
-    plt.ylabel("Number of pixels")
-    plt.xlabel("Signal level[LSB]")
-    plt.title("Histogram")
-
-    # Accumulated Histogram
-    fig = plt.figure(4)
-    aux = im.copy()
-    fig.clf()
-    plt.hist(aux.ravel(), bins=1024, fc="k", ec="k")
-    plt.gca().set_yscale("log")
-    plt.grid()
-    plt.ylabel("Number of pixels")
-    plt.xlabel("Signal level[LSB]")
-    plt.title("Accumulated histogram")
+    # Save images in non-loss quality compression and 16b, the directory is created if it doesn't exist
+    with FrameRecorder(dirOut, encoder="tiff") as recorder:
+        for i in range(imgs.shape[0]):
+            recorder.write(imgs[i, :, :] << 4, "im_" + str(i))
+    return 0